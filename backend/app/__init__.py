@@ -206,6 +206,10 @@ def create_app(config_name=None):
             if config_name == 'production':
                 raise
     
+    # Serialize API responses with orjson when available
+    from app.utils.json_provider import init_json_provider
+    init_json_provider(app)
+    
     # Set JWT config but DON'T initialize yet
     app.config['PROPAGATE_EXCEPTIONS'] = True
     app.config['JWT_DECODE_ALGORITHMS'] = ['HS256']
@@ -222,6 +226,10 @@ def create_app(config_name=None):
     # Initialize JWT FIRST before middleware so verify_jwt_in_request() works
     jwt.init_app(app)
     
+    # Shared cache (Redis when reachable, see app.extensions); used by the user profile cache
+    from app.extensions import cache
+    cache.init_app(app)
+    
     # P2-001 Fix: Register JWT token blacklist callbacks
     from app.utils.token_blacklist import is_blacklisted
     
@@ -17,6 +17,7 @@ from app.utils.auth_decorators import require_auth, log_user_activity
 from app.errors import AuthenticationError, ValidationError
 from app.utils.responses import APIResponse
 from app.extensions import limiter
+from app.services.user_profile_cache import get_user_profile_dict
 import uuid
 import logging
 from datetime import datetime, timedelta
@@ -299,13 +300,13 @@ def get_current_user():
     """
     try:
         current_user_id = get_jwt_identity()
-        current_user = User.query.get(current_user_id)
+        user_profile = get_user_profile_dict(current_user_id)
         
-        if not current_user:
+        if user_profile is None:
             raise AuthenticationError('User not found')
         
         return APIResponse.success(
-            data={'user': current_user.to_dict()},
+            data={'user': user_profile},
             message='User profile retrieved successfully'
         )
         
@@ -59,7 +59,7 @@ def get_dashboard():
                 'total_xp': user.total_xp or 0,
                 'streak': user.current_streak_days or 0,
                 'progress_percentage': user_progress.overall_progress if user_progress else 0,
-                'completed_lessons': user_progress.completed_lessons if user_progress else 0,
+                'completed_lessons': user_progress.completed_lesson_ids if user_progress else 0,
                 'endpoints': {
                     'data': '/dashboard/data',
                     'summary': '/dashboard/summary'
@@ -122,21 +122,10 @@ def get_dashboard_data():
             )
         
         # 1. Topics with modules (optimized to prevent N+1 queries)
-        # HIGH-002 Fix: Topic.modules is lazy='dynamic', so we can't use selectinload
-        # Instead, load all modules in a single query and group by topic_id
-        topics = Topic.query.order_by(Topic.order_index).all()
-        
-        # Load all modules for these topics in a single query
-        topic_ids = [topic.id for topic in topics]
-        from app.models.content import Module
-        all_modules = Module.query.filter(Module.topic_id.in_(topic_ids)).order_by(Module.order_index).all()
-        
-        # Group modules by topic_id for O(1) lookup
-        modules_by_topic = {}
-        for module in all_modules:
-            if module.topic_id not in modules_by_topic:
-                modules_by_topic[module.topic_id] = []
-            modules_by_topic[module.topic_id].append(module)
+        # All modules are loaded in one extra IN query, ordered by Module.order_index
+        topics = Topic.query.options(
+            selectinload(Topic.modules)
+        ).order_by(Topic.order_index).all()
         
         # 2. User Progress
         user_progress = UserProgress.query.filter_by(user_id=user_id).first()
@@ -172,8 +161,8 @@ def get_dashboard_data():
         topics_data = []
         for topic in topics:
             topic_dict = topic.to_dict()
-            # Add modules from pre-loaded dictionary (prevents N+1 queries)
-            topic_dict['modules'] = [m.to_dict() for m in modules_by_topic.get(topic.id, [])]
+            # Modules were eager-loaded above (no query here)
+            topic_dict['modules'] = [m.to_dict() for m in topic.modules]
             topics_data.append(topic_dict)
         
         response_data = {
@@ -244,7 +233,7 @@ def get_dashboard_summary():
                 'total_xp': user.total_xp,
                 'streak': user.current_streak_days,
                 'progress_percentage': user_progress.overall_progress if user_progress else 0,
-                'completed_lessons': user_progress.completed_lessons if user_progress else 0
+                'completed_lessons': user_progress.completed_lesson_ids if user_progress else 0
             },
             message="Dashboard summary retrieved successfully"
         )
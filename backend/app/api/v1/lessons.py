@@ -104,21 +104,8 @@ def complete_lesson(lesson_id):
                 )
                 db.session.add(module_progress)
             
-            # Calculate actual completed lessons count for this module
-            completed_lesson_count = db.session.query(UserLessonProgress).filter_by(
-                user_id=user_id,
-                is_completed=True
-            ).join(Lesson).filter(Lesson.module_id == module.id).count()
-            
-            module_progress.completed_lessons = completed_lesson_count
-            module_progress.total_lessons = module.total_lessons
-            module_progress.progress_percentage = (completed_lesson_count / module.total_lessons) * 100 if module.total_lessons > 0 else 0
-            module_progress.last_accessed = datetime.utcnow()
-            
-            if completed_lesson_count >= module.total_lessons:
-                module_progress.is_completed = True
-                if not module_progress.completed_at:
-                    module_progress.completed_at = datetime.utcnow()
+            # Derive module counts/percentage from the lesson rows in the database
+            module_progress.refresh_from_lessons()
             
             # Credit XP once on first completion (within the same transaction for atomicity)
             credited_xp = 0
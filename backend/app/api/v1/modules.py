@@ -5,7 +5,7 @@ Modules and content management API endpoints
 from flask import Blueprint, request, jsonify, g
 from flask_jwt_extended import jwt_required, get_jwt_identity, verify_jwt_in_request
 from sqlalchemy.orm import joinedload, selectinload
-from sqlalchemy import update, func
+from sqlalchemy import update, func, and_
 from sqlalchemy.exc import IntegrityError
 from app import db
 from app.models.content import Topic, Module, Lesson, NeuralContent
@@ -14,6 +14,7 @@ from app.models.user import User
 from app.utils.auth_decorators import require_auth, optional_auth
 from app.errors import ValidationError, NotFoundError
 from app.utils.responses import APIResponse
+from app.services.user_profile_cache import invalidate_user_profile
 # Phase 2 gamification (not available in MVP)
 try:
     from app.api.v1.gamification import update_leaderboard, check_achievements
@@ -180,30 +181,32 @@ def get_modules():
         per_page = min(per_page, 100) if per_page else 20
         status = request.args.get('status')
         
-        query = Module.query
+        # Modules and the caller's progress rows in one query: LEFT JOIN on
+        # (module_id, user_id), so anonymous callers simply get no progress rows
+        query = db.session.query(Module, UserModuleProgress).outerjoin(
+            UserModuleProgress,
+            and_(
+                UserModuleProgress.module_id == Module.id,
+                UserModuleProgress.user_id == user_id
+            )
+        )
         if status:
-            query = query.filter_by(status=status)
+            query = query.filter(Module.status == status)
         
         if topic_id:
-            query = query.filter_by(topic_id=topic_id)
+            query = query.filter(Module.topic_id == topic_id)
         
         # Eager load topics to prevent N+1 queries
-        # Use selectinload for better performance with many modules
         modules = query.options(joinedload(Module.topic))\
             .order_by(Module.order_index)\
             .paginate(page=page, per_page=per_page, error_out=False)
         
-        # Get user progress for modules - only for modules on current page to optimize
-        # Use a single query with IN clause to avoid N+1 queries
-        module_progress = {}
-        if user_id and modules.items:
-            module_ids = [m.id for m in modules.items]
-            if module_ids:  # Only query if we have modules
-                progress_records = UserModuleProgress.query.filter(
-                    UserModuleProgress.user_id == user_id,
-                    UserModuleProgress.module_id.in_(module_ids)
-                ).all()
-                module_progress = {p.module_id: p.to_dict() for p in progress_records}
+        module_items = [module for module, _ in modules.items]
+        module_progress = {
+            module.id: progress.to_dict()
+            for module, progress in modules.items
+            if progress is not None
+        }
         
         # Align shape with frontend expectation: items + pagination
         # Enrich module dict with frontend-friendly fields
@@ -259,12 +262,12 @@ def get_modules():
         
         # Serialize modules with error handling (use list comprehension for better performance)
         try:
-            serialized_modules = [serialize_module(module) for module in modules.items]
+            serialized_modules = [serialize_module(module) for module in module_items]
         except Exception as e:
             logger.error(f"Error during batch serialization: {e}", exc_info=True)
             # Fallback: serialize one by one with error handling
             serialized_modules = []
-            for module in modules.items:
+            for module in module_items:
                 try:
                     serialized_modules.append(serialize_module(module))
                 except Exception as e:
@@ -396,13 +399,16 @@ def get_module_lessons(module_id):
                 if progress.is_completed
             ]
         
+        # Set for O(1) membership checks in the loop below
+        completed_lesson_id_set = set(completed_lesson_ids)
+        
         # Process lessons with completion and locking status
         # Ensure lessons are sorted by order_index (already sorted, but verify)
         lessons_with_status = []
         for lesson_index, lesson in enumerate(active_lessons):
             lesson_data = lesson.to_dict()
             # Ensure all expected fields are present
-            lesson_data['is_completed'] = lesson.id in completed_lesson_ids
+            lesson_data['is_completed'] = lesson.id in completed_lesson_id_set
             lesson_data['is_locked'] = False
             # Ensure order_index is included for frontend sorting
             if 'order_index' not in lesson_data:
@@ -411,7 +417,7 @@ def get_module_lessons(module_id):
             # Sequential unlocking: lock lessons after first incomplete lesson
             if lesson_index > 0:
                 previous_lesson = active_lessons[lesson_index - 1]
-                if previous_lesson.id not in completed_lesson_ids:
+                if previous_lesson.id not in completed_lesson_id_set:
                     lesson_data['is_locked'] = True
             
             lessons_with_status.append(lesson_data)
@@ -699,36 +705,9 @@ def _complete_lesson_internal(user_id, module_id, lesson_id, data):
         )
         db.session.add(module_progress)
     
-    # P1-001 Fix: Maintain count in module progress record to prevent race conditions
-    # Instead of recalculating from database (which misses uncommitted transactions),
-    # increment the count atomically if this is a new completion
-    module = Module.query.get(module_id)
-    if not module:
-        raise NotFoundError('Module not found')
-    
-    # If this is a new completion, increment the count
-    if not already_completed:
-        # Increment completed_lessons count atomically
-        if module_progress.completed_lessons is None:
-            module_progress.completed_lessons = 0
-        module_progress.completed_lessons = (module_progress.completed_lessons or 0) + 1
-    else:
-        # Already completed - recalculate from database for accuracy (fallback)
-        completed_lesson_count = UserLessonProgress.query.filter_by(
-            user_id=user_id,
-            is_completed=True
-        ).join(Lesson).filter(Lesson.module_id == module_id).count()
-        module_progress.completed_lessons = completed_lesson_count
-        
-    module_progress.total_lessons = module.total_lessons
-    completed_lesson_count = module_progress.completed_lessons
-    module_progress.progress_percentage = (completed_lesson_count / module.total_lessons) * 100 if module.total_lessons > 0 else 0
-    module_progress.last_accessed = datetime.utcnow()
-    
-    if completed_lesson_count >= module.total_lessons:
-        module_progress.is_completed = True
-        if not module_progress.completed_at:
-            module_progress.completed_at = datetime.utcnow()
+    # P1-001 Fix: Derive the module counts from the lesson rows in a single UPDATE
+    # (flushes this completion first) instead of a Python-side read-modify-write
+    module_progress.refresh_from_lessons()
     
     # Credit XP once on first completion (within the same transaction for atomicity)
     # P0-002 Fix: Only credit XP if this is a new completion (already_completed=False)
@@ -771,6 +750,9 @@ def _complete_lesson_internal(user_id, module_id, lesson_id, data):
     try:
         db.session.commit()
         logger.debug(f'Successfully committed lesson completion for user {user_id}, lesson {lesson_id}')
+        if credited_xp > 0:
+            # total_xp was changed with a Core UPDATE, which ORM events don't see
+            invalidate_user_profile(user_id)
     except IntegrityError as e:
         # Duplicate key violation - another concurrent request already created/updated the progress record
         db.session.rollback()
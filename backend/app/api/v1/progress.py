@@ -258,15 +258,14 @@ def update_progress():
         elif 'overall_progress' in update_data:
             user_progress.overall_progress = update_data['overall_progress']
         if 'completedModules' in update_data:
-            user_progress.completed_modules = update_data['completedModules']
+            _record_completed_modules(current_user_id, update_data['completedModules'])
         elif 'completed_modules' in update_data:
-            user_progress.completed_modules = update_data['completed_modules']
+            _record_completed_modules(current_user_id, update_data['completed_modules'])
         if 'completedLessons' in update_data:
-            user_progress.completed_lessons = update_data['completedLessons']
+            _record_completed_lessons(current_user_id, update_data['completedLessons'])
         elif 'completed_lessons' in update_data:
-            user_progress.completed_lessons = update_data['completed_lessons']
+            _record_completed_lessons(current_user_id, update_data['completed_lessons'])
         
-        user_progress.updated_at = datetime.utcnow()
         db.session.commit()
         
         # Invalidate dashboard cache since progress changed
@@ -382,6 +381,96 @@ def _mark_lesson_completed(user_id: int, lesson_id: int, xp_earned: int) -> None
         )
         db.session.add(new_lesson_progress)
 
+def _validated_ids(raw_ids: Any, model, label: str) -> set:
+    """
+    Coerce client-supplied ids to ints and check they exist in model's table.
+    
+    Raises ValidationError for non-list input, non-integer ids or unknown ids.
+    """
+    if not raw_ids:
+        return set()
+    if not isinstance(raw_ids, (list, tuple)):
+        raise ValidationError(f'{label} must be a list of ids')
+    try:
+        ids = {int(raw_id) for raw_id in raw_ids}
+    except (TypeError, ValueError):
+        raise ValidationError(f'{label} must contain integer ids')
+    
+    known_ids = set(db.session.scalars(db.select(model.id).where(model.id.in_(ids))))
+    unknown_ids = ids - known_ids
+    if unknown_ids:
+        raise ValidationError(f'Unknown {label}: {sorted(unknown_ids)}')
+    return ids
+
+def _record_completed_lessons(user_id: int, lesson_ids: List[int]) -> None:
+    """
+    Mark a batch of lessons as completed.
+    
+    Only lessons not already completed are touched: existing rows are
+    flipped in place and missing rows are inserted in one batch.
+    """
+    from app.models.content import Lesson
+    
+    lesson_ids = _validated_ids(lesson_ids, Lesson, 'completed lessons')
+    if not lesson_ids:
+        return
+    
+    completed_at = datetime.utcnow()
+    existing_rows = UserLessonProgress.query.filter(
+        UserLessonProgress.user_id == user_id,
+        UserLessonProgress.lesson_id.in_(lesson_ids)
+    ).all()
+    
+    for lesson_progress in existing_rows:
+        lesson_ids.discard(lesson_progress.lesson_id)
+        if not lesson_progress.is_completed:
+            lesson_progress.is_completed = True
+            lesson_progress.status = 'completed'
+            lesson_progress.completed_at = completed_at
+    
+    db.session.add_all([
+        UserLessonProgress(
+            user_id=user_id,
+            lesson_id=lesson_id,
+            status='completed',
+            is_completed=True,
+            completed_at=completed_at
+        )
+        for lesson_id in lesson_ids
+    ])
+
+def _record_completed_modules(user_id: int, module_ids: List[int]) -> None:
+    """Mark a batch of modules as completed (same approach as _record_completed_lessons)."""
+    from app.models.content import Module
+    
+    module_ids = _validated_ids(module_ids, Module, 'completed modules')
+    if not module_ids:
+        return
+    
+    completed_at = datetime.utcnow()
+    existing_rows = UserModuleProgress.query.filter(
+        UserModuleProgress.user_id == user_id,
+        UserModuleProgress.module_id.in_(module_ids)
+    ).all()
+    
+    for module_progress in existing_rows:
+        module_ids.discard(module_progress.module_id)
+        if not module_progress.is_completed:
+            module_progress.is_completed = True
+            module_progress.progress_percentage = 100.0
+            module_progress.completed_at = completed_at
+    
+    db.session.add_all([
+        UserModuleProgress(
+            user_id=user_id,
+            module_id=module_id,
+            progress_percentage=100.0,
+            is_completed=True,
+            completed_at=completed_at
+        )
+        for module_id in module_ids
+    ])
+
 def _award_xp_for_lesson_completion(user_id: int, lesson_id: int, xp_amount: int) -> None:
     """Create an XP transaction record for completing a lesson."""
     xp_transaction = XPTransaction(
@@ -524,22 +613,27 @@ def get_leaderboard():
         
         logger.debug(f"Cache miss for leaderboard: page={page_number}, per_page={items_per_page}")
         
-        # Get paginated leaderboard (sorted by XP descending)
-        leaderboard_entries = Leaderboard.query.order_by(
-            Leaderboard.total_xp.desc()
-        ).paginate(page=page_number, per_page=items_per_page, error_out=False)
+        # Get paginated leaderboard (sorted by XP descending) as plain column rows -
+        # read-only listing, so skip ORM identity-map/instance-state overhead
+        total_entries = db.session.query(db.func.count(Leaderboard.user_id)).scalar() or 0
+        leaderboard_rows = db.session.execute(
+            db.select(*_LEADERBOARD_COLUMNS)
+            .order_by(Leaderboard.total_xp.desc())
+            .limit(items_per_page)
+            .offset((max(page_number, 1) - 1) * items_per_page)
+        ).all()
         
         # Calculate user's current rank
-        user_rank = _calculate_user_rank(current_user_id)
+        user_rank = _calculate_user_rank(current_user_id, total_entries)
         
         response_data = {
-            'data': [entry.to_dict() for entry in leaderboard_entries.items],
+            'data': [_leaderboard_row_to_dict(row) for row in leaderboard_rows],
             'page': page_number,
             'per_page': items_per_page,
-            'total': leaderboard_entries.total,
+            'total': total_entries,
             'additional_data': {
                 'userRank': user_rank,
-                'totalUsers': Leaderboard.query.count()
+                'totalUsers': total_entries
             }
         }
         
@@ -568,21 +662,40 @@ def get_leaderboard():
             error_code="INTERNAL_ERROR"
         )
 
-def _calculate_user_rank(user_id: int) -> int:
+_LEADERBOARD_COLUMNS = (
+    Leaderboard.user_id,
+    Leaderboard.username,
+    Leaderboard.avatar_url,
+    Leaderboard.total_xp,
+    Leaderboard.level,
+    Leaderboard.learning_streak,
+    Leaderboard.overall_progress,
+    Leaderboard.refreshed_at,
+) if Leaderboard is not None else ()
+
+def _leaderboard_row_to_dict(row) -> Dict[str, Any]:
+    """Serialize a leaderboard column row; same shape as Leaderboard.to_dict()"""
+    entry = row._asdict()
+    entry['refreshed_at'] = row.refreshed_at.isoformat() if row.refreshed_at else None
+    return entry
+
+def _calculate_user_rank(user_id: int, total_entries: int = None) -> int:
     """
     Calculate the user's current rank on the leaderboard.
     
     Rank is determined by counting how many users have more XP.
     """
-    user_entry = Leaderboard.query.filter_by(user_id=user_id).first()
+    user_xp = db.session.query(Leaderboard.total_xp).filter_by(user_id=user_id).scalar()
     
-    if not user_entry:
+    if user_xp is None:
         # User not on leaderboard yet
-        return Leaderboard.query.count() + 1
+        if total_entries is None:
+            total_entries = db.session.query(db.func.count(Leaderboard.user_id)).scalar() or 0
+        return total_entries + 1
     
     # Count users with more XP, then add 1 for rank
-    users_ahead = Leaderboard.query.filter(
-        Leaderboard.total_xp > user_entry.total_xp
-    ).count()
+    users_ahead = db.session.query(db.func.count(Leaderboard.user_id)).filter(
+        Leaderboard.total_xp > user_xp
+    ).scalar() or 0
     
     return users_ahead + 1
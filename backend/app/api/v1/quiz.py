@@ -302,8 +302,13 @@ def submit_quiz(module_id, lesson_id):
         answers = data['answers']
         time_spent = data.get('timeSpent', 0)
         
-        # Get quiz questions
-        questions = QuizQuestion.query.filter_by(
+        # Get quiz questions - only the columns grading needs (skips the text/explanation blobs)
+        questions = db.session.query(
+            QuizQuestion.id,
+            QuizQuestion.question_type,
+            QuizQuestion.correct_answer,
+            QuizQuestion.points
+        ).filter_by(
             lesson_id=lesson_id, 
             status='active'
         ).all()
@@ -774,22 +779,31 @@ def get_quiz_analytics(module_id, lesson_id):
 def get_quiz_leaderboard(lesson_id):
     """Get leaderboard for a specific quiz"""
     try:
-        # Get top 10 scores for this lesson
-        top_attempts = QuizAttempt.query.filter_by(
-            lesson_id=lesson_id
+        # Get top 10 scores for this lesson - only the columns we return,
+        # with the username joined in (no per-row User lookup)
+        top_attempts = db.session.query(
+            User.username,
+            QuizAttempt.score,
+            QuizAttempt.time_spent,
+            QuizAttempt.attempt_number,
+            QuizAttempt.submitted_at
+        ).join(
+            User, User.id == QuizAttempt.user_id
+        ).filter(
+            QuizAttempt.lesson_id == lesson_id
         ).order_by(QuizAttempt.score.desc(), QuizAttempt.time_spent.asc()).limit(10).all()
         
-        leaderboard = []
-        for i, attempt in enumerate(top_attempts):
-            user = User.query.get(attempt.user_id)
-            leaderboard.append({
-                'rank': i + 1,
-                'username': user.username,
+        leaderboard = [
+            {
+                'rank': rank,
+                'username': attempt.username,
                 'score': attempt.score,
                 'timeSpent': attempt.time_spent,
                 'attemptNumber': attempt.attempt_number,
-                'submittedAt': attempt.submitted_at.isoformat()
-            })
+                'submittedAt': attempt.submitted_at.isoformat() if attempt.submitted_at else None
+            }
+            for rank, attempt in enumerate(top_attempts, start=1)
+        ]
         
         return APIResponse.success(
             data={
@@ -11,7 +11,7 @@ This module handles all user-related operations including:
 from flask import Blueprint, request, jsonify
 from flask_jwt_extended import jwt_required, get_jwt_identity
 from app import db
-from app.models.user import User, UserActivityLog
+from app.models.user import User, UserActivityLog, ADMIN_TYPES
 from app.models.progress import UserProgress, XPTransaction
 # Phase 2 models (not available in MVP)
 try:
@@ -28,6 +28,8 @@ except ImportError:
     UserSettings = None
     UserNotificationPreferences = None
 from app.utils.auth_decorators import require_auth, require_admin, require_super_admin, log_user_activity
+from app.middleware import invalidate_user_cache
+from app.services.user_profile_cache import get_user_profile_dict
 from app.errors import ValidationError, NotFoundError
 from app.utils.responses import APIResponse
 from datetime import datetime, timedelta
@@ -53,16 +55,14 @@ def get_profile():
     """
     try:
         current_user_id = get_jwt_identity()
-        current_user = User.query.get(current_user_id)
+        # Served from the profile cache; it is invalidated on every committed User change
+        user_profile = get_user_profile_dict(current_user_id)
         
-        if not current_user:
+        if user_profile is None:
             raise NotFoundError('User not found')
         
-        # Refresh user object to ensure we have the latest data from database
-        db.session.refresh(current_user)
-        
         return APIResponse.success(
-            data={'user': current_user.to_dict()},
+            data={'user': user_profile},
             message="Profile retrieved successfully"
         )
         
@@ -106,7 +106,6 @@ def update_profile():
         _update_profile_field(current_user, 'website', update_data)
         _update_profile_field(current_user, 'avatar_url', update_data)
         
-        current_user.updated_at = datetime.utcnow()
         db.session.commit()
         
         return APIResponse.success(
@@ -595,7 +594,7 @@ def update_settings():
 
 @users_bp.route('/change-password', methods=['POST'])
 @jwt_required()
-@log_user_activity('change_password', 'User changed password')
+@log_user_activity('change_password', 'User changed password', sync=True)
 def change_password():
     """
     Change the authenticated user's password.
@@ -628,7 +627,6 @@ def change_password():
         
         # Set new password (will be hashed automatically)
         current_user.set_password(new_password)
-        current_user.updated_at = datetime.utcnow()
         db.session.commit()
         
         return APIResponse.success(
@@ -745,7 +743,7 @@ def get_user_details(user_id):
 @users_bp.route('/<int:user_id>', methods=['PUT'])
 @jwt_required()
 @require_admin
-@log_user_activity('update_user', 'Admin updated user')
+@log_user_activity('update_user', 'Admin updated user', sync=True)
 def update_user(user_id):
     """Update user data and permissions (admin only)"""
     try:
@@ -762,6 +760,8 @@ def update_user(user_id):
         if 'is_admin' in data:
             user.is_admin = data['is_admin']
         if 'admin_type' in data:
+            if data['admin_type'] is not None and data['admin_type'] not in ADMIN_TYPES:
+                raise ValidationError(f"admin_type must be one of: {', '.join(ADMIN_TYPES)}")
             user.admin_type = data['admin_type']
         if 'level' in data:
             user.level = data['level']
@@ -782,8 +782,6 @@ def update_user(user_id):
                 raise ValidationError('Username already taken')
             user.username = data['username']
         
-        user.updated_at = datetime.utcnow()
-        
         # Log admin action
         from app.models.admin import AdminLog
         admin_log = AdminLog(
@@ -798,6 +796,7 @@ def update_user(user_id):
         db.session.add(admin_log)
         
         db.session.commit()
+        invalidate_user_cache(user_id)
         
         return APIResponse.success(
             data={'user': user.to_dict()},
@@ -823,7 +822,7 @@ def update_user(user_id):
 @users_bp.route('/<int:user_id>', methods=['DELETE'])
 @jwt_required()
 @require_super_admin
-@log_user_activity('delete_user', 'Admin deleted user')
+@log_user_activity('delete_user', 'Admin deleted user', sync=True)
 def delete_user(user_id):
     """Delete user account (super admin only)"""
     try:
@@ -849,6 +848,7 @@ def delete_user(user_id):
         # Delete user (cascade will handle related records)
         db.session.delete(user)
         db.session.commit()
+        invalidate_user_cache(user_id)
         
         return APIResponse.success(
             message='User deleted successfully'
@@ -871,7 +871,7 @@ def delete_user(user_id):
 @users_bp.route('/<int:user_id>/reset-password', methods=['POST'])
 @jwt_required()
 @require_admin
-@log_user_activity('reset_user_password', 'Admin reset user password')
+@log_user_activity('reset_user_password', 'Admin reset user password', sync=True)
 def reset_user_password(user_id):
     """Reset user password (admin only)"""
     try:
@@ -902,7 +902,6 @@ def reset_user_password(user_id):
                 'message': 'Temporary password generated',
                 'temporary_password': temp_password
             }
-        user.updated_at = datetime.utcnow()
         
         # Log admin action
         from app.models.admin import AdminLog
@@ -942,7 +941,7 @@ def reset_user_password(user_id):
 @users_bp.route('/<int:user_id>/set-password', methods=['POST'])
 @jwt_required()
 @require_admin
-@log_user_activity('set_user_password', 'Admin set user password')
+@log_user_activity('set_user_password', 'Admin set user password', sync=True)
 def set_user_password(user_id):
     """Admin: directly set a user's password"""
     try:
@@ -961,7 +960,6 @@ def set_user_password(user_id):
         validate_password(new_password)
 
         user.set_password(new_password)
-        user.updated_at = datetime.utcnow()
 
         # Log admin action
         from app.models.admin import AdminLog
@@ -3,7 +3,8 @@ Error handling and custom exceptions
 """
 
 from flask import jsonify
-from werkzeug.exceptions import HTTPException
+from werkzeug.exceptions import HTTPException, default_exceptions
+import json
 import logging
 
 logger = logging.getLogger(__name__)
@@ -12,6 +13,13 @@ class APIException(Exception):
     """Base API exception class"""
     status_code = 500
     message = 'An error occurred'
+    code = 'APIEXCEPTION'
+    
+    def __init_subclass__(cls, **kwargs):
+        # Resolve the error code once per class instead of on every to_dict() call
+        super().__init_subclass__(**kwargs)
+        if 'code' not in cls.__dict__:
+            cls.code = cls.__name__.upper()
     
     def __init__(self, message=None, status_code=None, payload=None):
         super().__init__()
@@ -25,7 +33,7 @@ class APIException(Exception):
         rv = dict(self.payload or ())
         rv['error'] = self.message
         rv['message'] = self.message  # Keep for backward compatibility
-        rv['code'] = self.__class__.__name__.upper()
+        rv['code'] = self.code
         rv['status_code'] = self.status_code
         if self.payload:
             rv['details'] = self.payload
@@ -81,6 +89,46 @@ class ConfigurationError(APIException):
     status_code = 500
     message = 'Configuration error'
 
+# Shared shape of every error body; handlers copy it rather than rebuilding the literal
+_ERROR_TEMPLATE = {
+    'error': None,
+    'message': None,  # Keep for backward compatibility
+    'code': None,
+    'status_code': None,
+    'type': None,
+    'details': None,
+}
+
+def _error_response(message, code, status_code, error_type, details):
+    """Build a JSON error response from the shared error template"""
+    body = _ERROR_TEMPLATE.copy()
+    body['error'] = body['message'] = message
+    body['code'] = code
+    body['status_code'] = status_code
+    body['type'] = error_type
+    body['details'] = details
+    response = jsonify(body)
+    response.status_code = status_code
+    return response
+
+def _render_http_error_body(code, description):
+    """Render the HTTPException JSON body the same way jsonify would"""
+    body = {
+        'error': description,
+        'message': description,  # Keep for backward compatibility
+        'code': f'HTTP_{code}',
+        'status_code': code,
+        'details': {}
+    }
+    return json.dumps(body, sort_keys=True, separators=(',', ':')) + '\n'
+
+# Pre-rendered bodies for werkzeug's standard HTTP errors, keyed by status code.
+# Only used when the exception still carries its default description.
+_HTTP_ERROR_BODIES = {
+    code: (exc.description, _render_http_error_body(code, exc.description))
+    for code, exc in default_exceptions.items()
+}
+
 def register_error_handlers(app):
     """Register error handlers for the Flask app"""
     
@@ -100,6 +148,10 @@ def register_error_handlers(app):
     def handle_http_exception(error):
         """Handle HTTP exceptions"""
         logger.error(f"HTTP Exception: {error.code} - {error.description}")
+        cached = _HTTP_ERROR_BODIES.get(error.code)
+        if cached is not None and cached[0] == error.description:
+            # Default description - serve the body rendered at import time
+            return app.response_class(cached[1], status=error.code, mimetype='application/json')
         response = jsonify({
             'error': error.description,
             'message': error.description,  # Keep for backward compatibility
@@ -114,163 +166,64 @@ def register_error_handlers(app):
     def handle_validation_error(error):
         """Handle validation errors"""
         logger.warning(f"Validation Error: {error.message}")
-        response = jsonify({
-            'error': error.message,
-            'message': error.message,  # Keep for backward compatibility
-            'code': 'VALIDATION_ERROR',
-            'status_code': 400,
-            'type': 'validation_error',
-            'details': error.payload or {}
-        })
-        response.status_code = 400
-        return response
+        return _error_response(error.message, 'VALIDATION_ERROR', 400, 'validation_error', error.payload or {})
     
     @app.errorhandler(AuthenticationError)
     def handle_authentication_error(error):
         """Handle authentication errors"""
         logger.warning(f"Authentication Error: {error.message}")
-        response = jsonify({
-            'error': error.message,
-            'message': error.message,
-            'code': 'AUTHENTICATION_ERROR',
-            'status_code': 401,
-            'type': 'authentication_error',
-            'details': error.payload or {}
-        })
-        response.status_code = 401
-        return response
+        return _error_response(error.message, 'AUTHENTICATION_ERROR', 401, 'authentication_error', error.payload or {})
     
     @app.errorhandler(AuthorizationError)
     def handle_authorization_error(error):
         """Handle authorization errors"""
         logger.warning(f"Authorization Error: {error.message}")
-        response = jsonify({
-            'error': error.message,
-            'message': error.message,
-            'code': 'AUTHORIZATION_ERROR',
-            'status_code': 403,
-            'type': 'authorization_error',
-            'details': error.payload or {}
-        })
-        response.status_code = 403
-        return response
+        return _error_response(error.message, 'AUTHORIZATION_ERROR', 403, 'authorization_error', error.payload or {})
     
     @app.errorhandler(NotFoundError)
     def handle_not_found_error(error):
         """Handle not found errors"""
         logger.warning(f"Not Found Error: {error.message}")
-        response = jsonify({
-            'error': error.message,
-            'message': error.message,
-            'code': 'NOT_FOUND_ERROR',
-            'status_code': 404,
-            'type': 'not_found_error',
-            'details': error.payload or {}
-        })
-        response.status_code = 404
-        return response
+        return _error_response(error.message, 'NOT_FOUND_ERROR', 404, 'not_found_error', error.payload or {})
     
     @app.errorhandler(ConflictError)
     def handle_conflict_error(error):
         """Handle conflict errors"""
         logger.warning(f"Conflict Error: {error.message}")
-        response = jsonify({
-            'error': error.message,
-            'message': error.message,
-            'code': 'CONFLICT_ERROR',
-            'status_code': 409,
-            'type': 'conflict_error',
-            'details': error.payload or {}
-        })
-        response.status_code = 409
-        return response
+        return _error_response(error.message, 'CONFLICT_ERROR', 409, 'conflict_error', error.payload or {})
     
     @app.errorhandler(RateLimitError)
     def handle_rate_limit_error(error):
         """Handle rate limit errors"""
         logger.warning(f"Rate Limit Error: {error.message}")
-        response = jsonify({
-            'error': error.message,
-            'message': error.message,
-            'code': 'RATE_LIMIT_ERROR',
-            'status_code': 429,
-            'type': 'rate_limit_error',
-            'details': error.payload or {}
-        })
-        response.status_code = 429
-        return response
+        return _error_response(error.message, 'RATE_LIMIT_ERROR', 429, 'rate_limit_error', error.payload or {})
     
     @app.errorhandler(OpenAIError)
     def handle_openai_error(error):
         """Handle OpenAI API errors"""
         logger.error(f"OpenAI Error: {error.message}", exc_info=True)
-        response = jsonify({
-            'error': error.message,
-            'message': error.message,
-            'code': 'OPENAI_ERROR',
-            'status_code': 502,
-            'type': 'openai_error',
-            'details': error.payload or {}
-        })
-        response.status_code = 502
-        return response
+        return _error_response(error.message, 'OPENAI_ERROR', 502, 'openai_error', error.payload or {})
     
     @app.errorhandler(DatabaseError)
     def handle_database_error(error):
         """Handle database errors"""
         logger.error(f"Database Error: {error.message}", exc_info=True)
-        response = jsonify({
-            'error': 'Database operation failed',
-            'message': 'Database operation failed',
-            'code': 'DATABASE_ERROR',
-            'status_code': 500,
-            'type': 'database_error',
-            'details': error.payload or {}
-        })
-        response.status_code = 500
-        return response
+        return _error_response('Database operation failed', 'DATABASE_ERROR', 500, 'database_error', error.payload or {})
     
     @app.errorhandler(ExternalServiceError)
     def handle_external_service_error(error):
         """Handle external service errors"""
         logger.error(f"External Service Error: {error.message}", exc_info=True)
-        response = jsonify({
-            'error': 'External service unavailable',
-            'message': 'External service unavailable',
-            'code': 'EXTERNAL_SERVICE_ERROR',
-            'status_code': 502,
-            'type': 'service_error',
-            'details': error.payload or {}
-        })
-        response.status_code = 502
-        return response
+        return _error_response('External service unavailable', 'EXTERNAL_SERVICE_ERROR', 502, 'service_error', error.payload or {})
     
     @app.errorhandler(ConfigurationError)
     def handle_configuration_error(error):
         """Handle configuration errors"""
         logger.error(f"Configuration Error: {error.message}", exc_info=True)
-        response = jsonify({
-            'error': 'System configuration error',
-            'message': 'System configuration error',
-            'code': 'CONFIGURATION_ERROR',
-            'status_code': 500,
-            'type': 'configuration_error',
-            'details': error.payload or {}
-        })
-        response.status_code = 500
-        return response
+        return _error_response('System configuration error', 'CONFIGURATION_ERROR', 500, 'configuration_error', error.payload or {})
     
     @app.errorhandler(Exception)
     def handle_generic_exception(error):
         """Handle generic exceptions"""
         logger.error(f"Unhandled Exception: {str(error)}", exc_info=True)
-        response = jsonify({
-            'error': 'An internal server error occurred',
-            'message': 'An internal server error occurred',  # Keep for backward compatibility
-            'code': 'INTERNAL_ERROR',
-            'status_code': 500,
-            'type': 'internal_error',
-            'details': {}
-        })
-        response.status_code = 500
-        return response
+        return _error_response('An internal server error occurred', 'INTERNAL_ERROR', 500, 'internal_error', {})
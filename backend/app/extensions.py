@@ -21,61 +21,48 @@ def get_rate_limit_key():
         return f"user:{g.current_user_id}"
     return get_remote_address()
 
-# Rate Limiter - Use Redis when available, fallback to memory for development
-redis_url = os.environ.get('REDIS_URL')
-if redis_url and not redis_url.startswith('memory://'):
+def _redis_available(url):
+    """
+    Check once at startup whether the configured Redis server answers a PING.
+    Storage backends connect lazily, so without this check a dead Redis would
+    only surface as errors on the first rate-limited or cached request.
+    """
+    if not url or url.startswith('memory://'):
+        return False
     try:
-        # Try to use Redis for rate limiting
-        limiter = Limiter(
-            key_func=get_rate_limit_key,
-            default_limits=["200 per day", "50 per hour"],
-            storage_uri=redis_url,
-            strategy="fixed-window",
-            headers_enabled=True
-        )
-        logger.info(f"Rate limiting using Redis: {redis_url}")
+        import redis
+        redis.Redis.from_url(url, socket_connect_timeout=1, socket_timeout=1).ping()
+        return True
     except Exception as e:
-        logger.warning(f"Failed to initialize Redis rate limiter, falling back to memory: {e}")
-        limiter = Limiter(
-            key_func=get_rate_limit_key,
-            default_limits=["200 per day", "50 per hour"],
-            storage_uri="memory://",
-            strategy="fixed-window",
-            headers_enabled=True
-        )
-else:
-    # Use memory storage for development
-    limiter = Limiter(
-        key_func=get_rate_limit_key,
-        default_limits=["200 per day", "50 per hour"],
-        storage_uri="memory://",
-        strategy="fixed-window",
-        headers_enabled=True
-    )
-    if not os.environ.get('REDIS_URL'):
-        logger.info("Rate limiting using in-memory storage (Redis not configured)")
+        logger.warning(f"Redis at {url} is unreachable, falling back to in-memory storage: {e}")
+        return False
+
+redis_url = os.environ.get('REDIS_URL')
+_use_redis = _redis_available(redis_url)
+
+# Rate Limiter - Use Redis when available, fallback to memory for development
+limiter = Limiter(
+    key_func=get_rate_limit_key,
+    default_limits=["200 per day", "50 per hour"],
+    storage_uri=redis_url if _use_redis else "memory://",
+    strategy="fixed-window",
+    headers_enabled=True
+)
 
 # Cache - Use Redis when available, fallback to simple cache for development
-if redis_url and not redis_url.startswith('memory://'):
-    try:
-        cache = Cache(config={
-            'CACHE_TYPE': 'RedisCache',
-            'CACHE_REDIS_URL': redis_url,
-            'CACHE_DEFAULT_TIMEOUT': 300
-        })
-        logger.info("Cache using Redis")
-    except Exception as e:
-        logger.warning(f"Failed to initialize Redis cache, falling back to simple cache: {e}")
-        cache = Cache(config={
-            'CACHE_TYPE': 'SimpleCache',
-            'CACHE_DEFAULT_TIMEOUT': 300
-        })
+if _use_redis:
+    cache = Cache(config={
+        'CACHE_TYPE': 'RedisCache',
+        'CACHE_REDIS_URL': redis_url,
+        'CACHE_DEFAULT_TIMEOUT': 300
+    })
 else:
-    # Use simple cache for development
     cache = Cache(config={
         'CACHE_TYPE': 'SimpleCache',
         'CACHE_DEFAULT_TIMEOUT': 300
     })
-    if not os.environ.get('REDIS_URL'):
-        logger.info("Cache using simple in-memory storage (Redis not configured)")
 
+if _use_redis:
+    logger.info(f"Rate limiting and cache using Redis: {redis_url}")
+elif not redis_url:
+    logger.info("Rate limiting and cache using in-memory storage (Redis not configured)")
@@ -4,86 +4,259 @@ Middleware for request processing, authentication, and logging
 
 from flask import request, g, jsonify, current_app
 from flask_jwt_extended import verify_jwt_in_request, get_jwt_identity, get_jwt
-from functools import wraps
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache, wraps
+from cachetools import TTLCache
+import hashlib
+import math
+import threading
 import time
 import logging
 import os
+import sys
+import redis
 from app.models.user import User
-from app.errors import AuthenticationError, AuthorizationError, RateLimitError
+from app.utils.async_logging import enable_queue_logging
+from app.services.activity_log_service import enqueue_activity, start_activity_log_worker
 from app import db
 
 logger = logging.getLogger(__name__)
 
+# Static route matches used on every request (tuple for a single startswith, frozenset for O(1) membership)
+# Endpoint names contain '.', so they are not auto-interned as literals; intern them explicitly
+_SKIP_AUTH_ENDPOINTS = frozenset(map(sys.intern, ('auth.login', 'auth.register', 'health.check')))
+_PUBLIC_PREFIXES = ('/api/v1/public',)
+_ADMIN_PREFIXES = ('/api/v1/admin',)
+_AUTH_PREFIXES = ('/api/v1/auth',)
+_HEALTH_PREFIXES = ('/api/health', '/api/v1/health')
+_MAINTENANCE_EXEMPT_PREFIXES = _ADMIN_PREFIXES + _HEALTH_PREFIXES
+
+# Verified-JWT cache: SHA-256(Authorization header)[:16] -> (identity, claims)
+# Skips signature verification for tokens seen in the last few seconds. Token
+# expiry is still enforced locally on every hit. Route-level @jwt_required still
+# performs full verification (including the blocklist). Reset in register_middleware.
+_jwt_cache = TTLCache(maxsize=10000, ttl=30)
+_jwt_cache_lock = threading.Lock()
+_sha256 = hashlib.sha256
+
+def _resolve_jwt_identity():
+    """
+    Return the JWT identity for the current request (or None).
+    
+    Uses the verification cache when the same token was verified recently,
+    otherwise falls back to verify_jwt_in_request and caches the result.
+    The identity and claims are also stored on g (see current_identity).
+    """
+    g.jwt_identity = None
+    g.jwt_claims = None
+    auth_header = request.headers.get('Authorization')
+    if not auth_header:
+        # Tokens are only read from headers, so there is nothing to verify
+        return None
+    
+    # 16-byte raw digest prefix: compact bytes key, no hex encoding
+    cache_key = _sha256(auth_header.encode()).digest()[:16]
+    with _jwt_cache_lock:
+        cached = _jwt_cache.get(cache_key)
+    if cached is not None and cached[1].get('exp', 0) > time.time():
+        g.jwt_identity, g.jwt_claims = cached
+        return cached[0]
+    
+    verify_jwt_in_request(optional=True)
+    user_id = get_jwt_identity()
+    if user_id:
+        claims = get_jwt()
+        g.jwt_identity = user_id
+        g.jwt_claims = claims
+        if claims.get('exp'):
+            with _jwt_cache_lock:
+                _jwt_cache[cache_key] = (user_id, claims)
+    return user_id
+
+def current_identity():
+    """JWT identity resolved by the middleware for this request, without re-reading the token"""
+    return getattr(g, 'jwt_identity', None)
+
+def current_claims():
+    """JWT claims resolved by the middleware for this request, or None"""
+    return getattr(g, 'jwt_claims', None)
+
+# Lightweight per-user snapshot stored in g.user instead of a full ORM row.
+# Only the columns the middleware itself reads are loaded; routes that need the
+# full User use require_auth / g.current_user.
+_UserSnapshot = namedtuple('_UserSnapshot', ('id', 'is_active', 'is_admin'))
+_user_cache = TTLCache(maxsize=5000, ttl=60)
+_user_cache_lock = threading.Lock()
+
+def _load_user_snapshot(user_id):
+    """Return a cached _UserSnapshot for user_id, querying only the needed columns on a miss"""
+    with _user_cache_lock:
+        snapshot = _user_cache.get(user_id)
+    if snapshot is not None:
+        return snapshot
+    
+    row = db.session.query(User.id, User.is_active, User.is_admin).filter(User.id == user_id).first()
+    if row is None:
+        return None
+    snapshot = _UserSnapshot(*row)
+    with _user_cache_lock:
+        _user_cache[user_id] = snapshot
+    return snapshot
+
+def invalidate_user_cache(user_id):
+    """Drop the cached snapshot for a user; call after changing status or role"""
+    with _user_cache_lock:
+        # JWT identities may arrive as str or int, so clear both forms
+        _user_cache.pop(user_id, None)
+        _user_cache.pop(str(user_id), None)
+
+# Maintenance flag changes rarely, so it is read from the database at most once per TTL
+_MAINTENANCE_KEY = 'maintenance_mode'
+_maintenance_cache = TTLCache(maxsize=1, ttl=int(os.getenv('MAINT_CACHE_TTL', '10')))
+_maintenance_cache_lock = threading.Lock()
+
+@lru_cache(maxsize=None)
+def _system_setting_model():
+    """Resolve the optional SystemSetting model once (deferred to avoid import cycles)"""
+    try:
+        from app.models.settings import SystemSetting
+    except ImportError:
+        return None
+    return SystemSetting
+
+def _get_maintenance_flag():
+    """Return whether maintenance mode is enabled, using a short-lived cache"""
+    with _maintenance_cache_lock:
+        cached = _maintenance_cache.get(_MAINTENANCE_KEY)
+    if cached is not None:
+        return cached
+    
+    SystemSetting = _system_setting_model()
+    if SystemSetting is None:
+        # Settings model is not part of this release - maintenance mode can't be enabled
+        return False
+    
+    try:
+        setting = SystemSetting.query.filter_by(key=_MAINTENANCE_KEY).first()
+        is_maintenance = bool(setting and ((setting.value is True) or (isinstance(setting.value, dict) and setting.value.get('enabled') is True)))
+    except Exception as e:
+        # HIGH-001 Fix: Fail open on maintenance check errors to prevent site-wide outage
+        # If we can't determine maintenance status, allow access. The failure is cached
+        # like a normal result so an unavailable database is not hit on every request.
+        logger.error(f"Maintenance mode check failed: {str(e)}", exc_info=True)
+        is_maintenance = False
+    
+    with _maintenance_cache_lock:
+        _maintenance_cache[_MAINTENANCE_KEY] = is_maintenance
+    return is_maintenance
+
+def _maintenance_flag_is_cached():
+    """True when the next _get_maintenance_flag() call will not touch the database"""
+    with _maintenance_cache_lock:
+        return _MAINTENANCE_KEY in _maintenance_cache
+
+def _refresh_maintenance_flag(app):
+    """Worker-thread entry point: read the maintenance flag inside its own app context"""
+    with app.app_context():
+        try:
+            return _get_maintenance_flag()
+        finally:
+            db.session.remove()
+
+def invalidate_maintenance_cache():
+    """Force the next request to re-read maintenance mode; call after toggling the setting"""
+    with _maintenance_cache_lock:
+        _maintenance_cache.clear()
+
+def _init_request_state():
+    """Reset the per-request attributes the middleware owns on g"""
+    g.start_time = time.time()
+    g.user = None
+    g.skip_jwt = False
+
 def register_middleware(app):
     """Register middleware for the Flask app"""
+    global _jwt_cache
+    _jwt_cache = TTLCache(maxsize=10000, ttl=app.config.get('JWT_VERIFY_CACHE_TTL', 30))
+    
+    # Per-request logging runs on the hot path; hand the handler I/O to a background thread
+    enable_queue_logging(logger)
+    
+    # Background writer for batched UserActivityLog inserts
+    start_activity_log_worker(app)
+    
+    # Optional concurrent lookups: on a maintenance-cache miss, read the flag on a
+    # worker thread while this thread verifies the JWT and loads the user
+    lookup_executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix='middleware') if app.config.get('ASYNC_MIDDLEWARE') else None
     
     @app.before_request
     def before_request():
         """Process requests before they reach the route handlers"""
-        g.start_time = time.time()
-        g.user = None
-        g.skip_jwt = False
+        _init_request_state()
+        
+        # CORS preflights carry no credentials and are answered by Flask-CORS
+        if request.method == 'OPTIONS':
+            return
+        
+        endpoint = request.endpoint
+        path = request.path
         
         # Skip authentication for certain endpoints
-        if request.endpoint in ['auth.login', 'auth.register', 'health.check']:
+        if endpoint in _SKIP_AUTH_ENDPOINTS:
             return
         
         # Skip auth only for truly public endpoints (explicit public routes)
         # Do NOT blanket bypass /api/v1/modules - individual routes should use @optional_auth
-        if request.path.startswith('/api/v1/public'):
+        if path.startswith(_PUBLIC_PREFIXES):
             return
         
         # Check if blueprint set skip_jwt flag
-        if getattr(g, 'skip_jwt', False):
+        if g.skip_jwt:
             return
+        
+        # Admin and health endpoints are always allowed during maintenance, so they never need the flag
+        # CRITICAL-001 Fix: Correct admin endpoint path from /api/admin to /api/v1/admin
+        is_maintenance_exempt = path.startswith(_MAINTENANCE_EXEMPT_PREFIXES)
+        
+        maintenance_future = None
+        if lookup_executor is not None and not is_maintenance_exempt and not _maintenance_flag_is_cached():
+            maintenance_future = lookup_executor.submit(_refresh_maintenance_flag, app)
             
         try:
-            verify_jwt_in_request(optional=True)
-            user_id = get_jwt_identity()
+            user_id = _resolve_jwt_identity()
             
             if user_id:
-                user = User.query.get(user_id)
+                user = _load_user_snapshot(user_id)
                 if user and user.is_active:
                     g.user = user
                 else:
-                    raise AuthenticationError('User not found or inactive')
+                    # Request continues anonymously; route-level auth decorators reject it if required
+                    logger.warning("Authentication failed for %s: user %s not found or inactive", endpoint, user_id)
                     
         except Exception as e:
-            if request.endpoint not in ['auth.login', 'auth.register', 'health.check']:
-                logger.warning(f"Authentication failed for {request.endpoint}: {str(e)}")
+            logger.warning(f"Authentication failed for {endpoint}: {str(e)}")
 
+        if is_maintenance_exempt:
+            return
+        
         # Enforce maintenance mode for non-admin users (learners)
-        try:
-            from app.models.settings import SystemSetting
-            setting = SystemSetting.query.filter_by(key='maintenance_mode').first()
-            is_maintenance = bool(setting and ((setting.value is True) or (isinstance(setting.value, dict) and setting.value.get('enabled') is True)))
-            if is_maintenance:
-                # Allow admins and admin endpoints; block learners from app routes
-                is_admin_user = bool(getattr(g, 'user', None) and getattr(g.user, 'is_admin', False))
-                # CRITICAL-001 Fix: Correct admin endpoint path from /api/admin to /api/v1/admin
-                is_admin_endpoint = request.path.startswith('/api/v1/admin')
-                is_auth_endpoint = request.path.startswith('/api/v1/auth')
-                is_health_endpoint = request.path.startswith('/api/health') or request.path.startswith('/api/v1/health')
-                if not is_admin_user and not is_admin_endpoint and not is_health_endpoint:
-                    # Allow login/register to proceed with an explicit maintenance message
-                    if is_auth_endpoint:
-                        return jsonify({
-                            'error': 'maintenance_mode',
-                            'message': 'The platform is currently under maintenance. Please try again later.'
-                        }), 503
-                    # Block other requests for learners
+        is_maintenance = maintenance_future.result() if maintenance_future is not None else _get_maintenance_flag()
+        if is_maintenance:
+            # Allow admins; block learners from app routes
+            is_admin_user = bool(getattr(g, 'user', None) and getattr(g.user, 'is_admin', False))
+            if not is_admin_user:
+                # Allow login/register to proceed with an explicit maintenance message
+                if path.startswith(_AUTH_PREFIXES):
                     return jsonify({
                         'error': 'maintenance_mode',
                         'message': 'The platform is currently under maintenance. Please try again later.'
                     }), 503
-        except Exception as e:
-            # HIGH-001 Fix: Fail open on maintenance check errors to prevent site-wide outage
-            # Log the error but allow access if maintenance check fails (prevents outage if DB temporarily unavailable)
-            logger.error(f"Maintenance mode check failed: {str(e)}", exc_info=True)
-            # Fail open: If we can't determine maintenance status, allow access
-            # This prevents site-wide outage if database is temporarily unavailable
-            # The maintenance mode check will work again once the database is available
-            pass
+                # Block other requests for learners
+                return jsonify({
+                    'error': 'maintenance_mode',
+                    'message': 'The platform is currently under maintenance. Please try again later.'
+                }), 503
     
     @app.after_request
     def after_request(response):
@@ -93,47 +266,108 @@ def register_middleware(app):
         # Manual header setting here causes duplication and potential conflicts
         # CORS headers are now handled entirely by Flask-CORS middleware
         
-        # Add security headers
-        response.headers['X-Content-Type-Options'] = 'nosniff'
-        response.headers['X-Frame-Options'] = 'DENY'
-        response.headers['X-XSS-Protection'] = '1; mode=block'
-        response.headers['Referrer-Policy'] = 'strict-origin-when-cross-origin'
-        
-        # Add CSP header for API responses
-        if request.path.startswith('/api/'):
-            response.headers['Content-Security-Policy'] = "default-src 'none'"
+        # Security headers are owned by app.security_headers, whose after_request
+        # runs after this one and sets them on every response
         
         # Log request duration
         if hasattr(g, 'start_time'):
             duration = time.time() - g.start_time
-            logger.info(f"{request.method} {request.path} - {response.status_code} - {duration:.3f}s")
+            # %-style args so formatting is skipped when INFO is disabled
+            logger.info("%s %s - %d - %.3fs", request.method, request.path, response.status_code, duration)
         
         return response
     
     @app.teardown_appcontext
     def close_db(error):
-        """Close database connections after each request to prevent connection leaks"""
-        from app import db
-        # SQLAlchemy automatically handles session cleanup, but we ensure connections are returned to pool
-        db.session.remove()
+        """Discard the session after a failed request so a broken transaction is never reused"""
+        # Flask-SQLAlchemy already removes the scoped session on every teardown;
+        # only repeat it explicitly when the request ended with an exception
+        if error is not None:
+            db.session.remove()
 
 # NOTE: Authentication decorators have been moved to app.utils.auth_decorators
 # Import from there instead: from app.utils.auth_decorators import require_auth, require_admin, require_super_admin
 # Rate limiting should use Flask-Limiter from app.extensions - see app.utils.auth_decorators.rate_limit
 # These duplicate decorators below are kept for backward compatibility but should not be used in new code
 
+# Sliding-window limiter: one sorted set per key, scored by request time (ms).
+# Atomically drops entries older than the window, counts the rest and admits the
+# request if under the limit. Returns {allowed, oldest_score_in_window}.
+_SLIDING_WINDOW_LUA = """
+local key = KEYS[1]
+local now = tonumber(ARGV[1])
+local window = tonumber(ARGV[2])
+local limit = tonumber(ARGV[3])
+redis.call('ZREMRANGEBYSCORE', key, 0, now - window)
+if redis.call('ZCARD', key) < limit then
+    redis.call('ZADD', key, now, ARGV[4])
+    redis.call('PEXPIRE', key, window)
+    return {1, 0}
+end
+local oldest = redis.call('ZRANGE', key, 0, 0, 'WITHSCORES')
+return {0, oldest[2]}
+"""
+_RATE_LIMIT_WINDOW_MS = 60 * 1000
+_sliding_window_script = None
+_sliding_window_lock = threading.Lock()
+
+def _get_sliding_window_script():
+    """Return the registered Lua script, or None when Redis is not configured"""
+    global _sliding_window_script
+    if _sliding_window_script is None:
+        storage_url = current_app.config.get('RATELIMIT_STORAGE_URL', 'memory://')
+        if not storage_url or storage_url.startswith('memory://'):
+            return None
+        with _sliding_window_lock:
+            if _sliding_window_script is None:
+                client = redis.Redis.from_url(storage_url, socket_connect_timeout=1, socket_timeout=1)
+                _sliding_window_script = client.register_script(_SLIDING_WINDOW_LUA)
+    return _sliding_window_script
+
 def rate_limit(requests_per_minute=60):
     """
     Legacy rate limiting decorator - DEPRECATED
     Use Flask-Limiter from app.extensions instead: @limiter.limit("X per minute")
-    This is kept for backward compatibility only
+    
+    Kept for backward compatibility. Enforces a Redis sorted-set sliding window
+    (no fixed-window boundary bursts) keyed by user or IP and function name.
+    Without Redis, or if Redis fails, requests are allowed through.
     """
     def decorator(f):
+        logger.warning(f"Using deprecated rate_limit decorator on {f.__name__}. Use @limiter.limit() instead.")
+        
         @wraps(f)
         def decorated_function(*args, **kwargs):
-            # Legacy stub implementation - routes should use Flask-Limiter directly
-            logger.warning(f"Using deprecated rate_limit decorator on {f.__name__}. Use @limiter.limit() instead.")
-            return f(*args, **kwargs)
+            try:
+                script = _get_sliding_window_script()
+            except Exception as e:
+                logger.warning(f"Rate limiter unavailable, allowing request: {e}")
+                script = None
+            if script is None:
+                return f(*args, **kwargs)
+            
+            user = getattr(g, 'user', None)
+            key = f"rl:{user.id if user else request.remote_addr}:{f.__name__}"
+            now_ms = int(time.time() * 1000)
+            member = f"{now_ms}:{os.urandom(4).hex()}"
+            try:
+                allowed, oldest = script(keys=[key], args=[now_ms, _RATE_LIMIT_WINDOW_MS, requests_per_minute, member])
+            except Exception as e:
+                # Fail open - a Redis outage should not take the endpoint down
+                logger.warning(f"Rate limit check failed for {key}, allowing request: {e}")
+                return f(*args, **kwargs)
+            
+            if int(allowed):
+                return f(*args, **kwargs)
+            
+            retry_after = max(1, math.ceil((float(oldest) + _RATE_LIMIT_WINDOW_MS - now_ms) / 1000))
+            response = jsonify({
+                'error': 'Rate limit exceeded',
+                'message': f'Too many requests. Limit is {requests_per_minute} per minute.'
+            })
+            response.status_code = 429
+            response.headers['Retry-After'] = str(retry_after)
+            return response
         return decorated_function
     return decorator
 
@@ -168,10 +402,9 @@ def log_user_activity(action, description=None):
         def decorated_function(*args, **kwargs):
             result = f(*args, **kwargs)
             
-            # Log user activity if user is authenticated
+            # Log user activity if user is authenticated (written in batches by a background worker)
             if g.user:
-                from app.models.user import UserActivityLog
-                activity_log = UserActivityLog(
+                enqueue_activity(
                     user_id=g.user.id,
                     action=action,
                     description=description,
@@ -179,8 +412,6 @@ def log_user_activity(action, description=None):
                     user_agent=request.headers.get('User-Agent'),
                     extra_metadata={'endpoint': request.endpoint, 'method': request.method}
                 )
-                db.session.add(activity_log)
-                db.session.commit()
             
             return result
         return decorated_function
@@ -8,6 +8,7 @@ from .progress import UserProgress, UserModuleProgress, UserLessonProgress, XPTr
 from .content import Module, Lesson, Topic, NeuralContent, ContentUpload
 from .quiz import QuizQuestion, QuizAttempt, QuizAnswer
 from .ai_usage import AIUsageLog, PromptGradingResult
+from .leaderboard import Leaderboard
 
 __all__ = [
     'User', 'UserSession', 'UserActivityLog',
@@ -15,4 +16,5 @@ __all__ = [
     'Module', 'Lesson', 'Topic', 'NeuralContent', 'ContentUpload',
     'QuizQuestion', 'QuizAttempt', 'QuizAnswer',
     'AIUsageLog', 'PromptGradingResult',
+    'Leaderboard',
 ]
@@ -2,7 +2,7 @@
 AI usage tracking and prompt grading models
 """
 
-from datetime import datetime
+from sqlalchemy.orm import deferred
 from app import db
 
 class AIUsageLog(db.Model):
@@ -27,12 +27,13 @@ class AIUsageLog(db.Model):
     cost_per_token = db.Column(db.Float, default=0.0)
     
     # Request/Response data
-    request_data = db.Column(db.JSON)  # Request parameters
-    response_data = db.Column(db.JSON)  # Response data
-    extra_metadata = db.Column(db.JSON)  # Additional context
+    # Payload columns are deferred as a group: usage stats only need tokens/cost
+    request_data = deferred(db.Column(db.JSON), group='payload')  # Request parameters
+    response_data = deferred(db.Column(db.JSON), group='payload')  # Response data
+    extra_metadata = deferred(db.Column(db.JSON), group='payload')  # Additional context
     
     # Timestamp
-    timestamp = db.Column(db.DateTime, default=datetime.utcnow, index=True)
+    timestamp = db.Column(db.DateTime, server_default=db.func.now(), index=True)
     
     # Relationships
     user = db.relationship('User', backref='ai_usage_logs')
@@ -87,7 +88,7 @@ class PromptGradingResult(db.Model):
     ai_usage_log_id = db.Column(db.Integer, db.ForeignKey('ai_usage_logs.id'))
     
     # Timestamp
-    timestamp = db.Column(db.DateTime, default=datetime.utcnow, index=True)
+    timestamp = db.Column(db.DateTime, server_default=db.func.now(), index=True)
     
     # Relationships
     user = db.relationship('User', backref='prompt_grading_results')
@@ -2,7 +2,6 @@
 Content management models for modules, lessons, and neural content
 """
 
-from datetime import datetime
 from app import db
 
 class Topic(db.Model):
@@ -19,11 +18,12 @@ class Topic(db.Model):
     order_index = db.Column(db.Integer, default=0)
     
     # Timestamps
-    created_at = db.Column(db.DateTime, default=datetime.utcnow)
-    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    created_at = db.Column(db.DateTime, server_default=db.func.now())
+    updated_at = db.Column(db.DateTime, server_default=db.text('CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP'), server_onupdate=db.FetchedValue())
     
     # Relationships
-    modules = db.relationship('Module', backref='topic', lazy='dynamic')
+    # Plain list (not lazy='dynamic') so callers can selectinload(Topic.modules)
+    modules = db.relationship('Module', backref='topic', order_by='Module.order_index')
     
     def to_dict(self):
         """Convert topic to dictionary"""
@@ -71,11 +71,12 @@ class Module(db.Model):
     status = db.Column(db.String(20), default='active')  # active, draft, archived
     
     # Timestamps
-    created_at = db.Column(db.DateTime, default=datetime.utcnow)
-    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    created_at = db.Column(db.DateTime, server_default=db.func.now())
+    updated_at = db.Column(db.DateTime, server_default=db.text('CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP'), server_onupdate=db.FetchedValue())
     
     # Relationships
     lessons = db.relationship('Lesson', backref='module', lazy='dynamic', cascade='all, delete-orphan')
+    user_progress = db.relationship('UserModuleProgress', back_populates='module')
     
     # Unique constraint
     __table_args__ = (db.UniqueConstraint('topic_id', 'module_number', name='unique_topic_module'),)
@@ -129,12 +130,13 @@ class Lesson(db.Model):
     status = db.Column(db.String(20), default='active')  # active, draft, archived
     
     # Timestamps
-    created_at = db.Column(db.DateTime, default=datetime.utcnow)
-    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    created_at = db.Column(db.DateTime, server_default=db.func.now())
+    updated_at = db.Column(db.DateTime, server_default=db.text('CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP'), server_onupdate=db.FetchedValue())
     
     # Relationships
     quiz_questions = db.relationship('QuizQuestion', backref='lesson', lazy='dynamic', cascade='all, delete-orphan')
     quiz_attempts = db.relationship('QuizAttempt', backref='lesson', lazy='dynamic')
+    user_progress = db.relationship('UserLessonProgress', back_populates='lesson')
     
     # Unique constraint
     __table_args__ = (db.UniqueConstraint('module_id', 'lesson_number', name='unique_module_lesson'),)
@@ -174,8 +176,8 @@ class NeuralContent(db.Model):
     content_data = db.Column(db.JSON, nullable=False)
     
     # Timestamps
-    created_at = db.Column(db.DateTime, default=datetime.utcnow)
-    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    created_at = db.Column(db.DateTime, server_default=db.func.now())
+    updated_at = db.Column(db.DateTime, server_default=db.text('CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP'), server_onupdate=db.FetchedValue())
     
     # Unique constraint
     __table_args__ = (db.UniqueConstraint('topic_id', 'module_number', 'lesson_number', name='unique_neural_content'),)
@@ -222,7 +224,7 @@ class ContentUpload(db.Model):
     is_public = db.Column(db.Boolean, default=False)
     
     # Timestamps
-    uploaded_at = db.Column(db.DateTime, default=datetime.utcnow)
+    uploaded_at = db.Column(db.DateTime, server_default=db.func.now())
     processed_at = db.Column(db.DateTime)
     
     # Relationships
@@ -268,8 +270,8 @@ class MediaFile(db.Model):
     extra_metadata = db.Column(db.JSON)  # Additional file metadata (dimensions, duration, etc.)
     is_public = db.Column(db.Boolean, default=False)
     download_count = db.Column(db.Integer, default=0)
-    uploaded_at = db.Column(db.DateTime, default=datetime.utcnow)
-    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    uploaded_at = db.Column(db.DateTime, server_default=db.func.now())
+    updated_at = db.Column(db.DateTime, server_default=db.text('CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP'), server_onupdate=db.FetchedValue())
     
     # Relationships
     uploader = db.relationship('User', backref=db.backref('uploaded_files', lazy=True))
@@ -0,0 +1,40 @@
+"""
+Leaderboard snapshot model
+"""
+
+from app import db
+
+class Leaderboard(db.Model):
+    """
+    Precomputed leaderboard rows (users joined with user_progress).
+
+    MySQL has no materialized views, so this table plays that role: it is
+    rebuilt periodically by app.services.leaderboard_service and read by the
+    leaderboard endpoints instead of joining users/user_progress per request.
+    """
+    __tablename__ = 'leaderboard_entries'
+
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id', ondelete='CASCADE'), primary_key=True)
+    username = db.Column(db.String(80), nullable=False)
+    avatar_url = db.Column(db.String(255))
+    total_xp = db.Column(db.Integer, default=0, index=True)  # Indexed for ranking queries
+    level = db.Column(db.Integer, default=1)
+    learning_streak = db.Column(db.Integer, default=0)
+    overall_progress = db.Column(db.Float, default=0.0)
+    refreshed_at = db.Column(db.DateTime, server_default=db.func.now())
+
+    def to_dict(self):
+        """Convert leaderboard entry to dictionary"""
+        return {
+            'user_id': self.user_id,
+            'username': self.username,
+            'avatar_url': self.avatar_url,
+            'total_xp': self.total_xp,
+            'level': self.level,
+            'learning_streak': self.learning_streak,
+            'overall_progress': self.overall_progress,
+            'refreshed_at': self.refreshed_at.isoformat() if self.refreshed_at else None
+        }
+
+    def __repr__(self):
+        return f'<Leaderboard User {self.user_id} {self.total_xp} XP>'
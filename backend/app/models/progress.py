@@ -2,9 +2,29 @@
 Progress tracking and gamification models
 """
 
-from datetime import datetime
+from sqlalchemy import text
 from app import db
 
+# Module rollup derived from user_lesson_progress rows in a single statement,
+# so concurrent lesson completions can't leave a stale Python-side counter
+_REFRESH_MODULE_PROGRESS_SQL = text("""
+    UPDATE user_module_progress ump
+    JOIN modules m ON m.id = ump.module_id
+    JOIN (
+        SELECT COUNT(*) AS done
+        FROM user_lesson_progress ulp
+        JOIN lessons l ON l.id = ulp.lesson_id
+        WHERE ulp.user_id = :user_id AND l.module_id = :module_id AND ulp.is_completed = 1
+    ) c
+    SET ump.completed_lessons = c.done,
+        ump.total_lessons = m.total_lessons,
+        ump.progress_percentage = IF(m.total_lessons > 0, c.done * 100.0 / m.total_lessons, 0),
+        ump.is_completed = (ump.is_completed OR c.done >= m.total_lessons),
+        ump.completed_at = IF(c.done >= m.total_lessons AND ump.completed_at IS NULL, UTC_TIMESTAMP(), ump.completed_at),
+        ump.last_accessed = UTC_TIMESTAMP()
+    WHERE ump.user_id = :user_id AND ump.module_id = :module_id
+""")
+
 class UserProgress(db.Model):
     """Overall user progress tracking"""
     __tablename__ = 'user_progress'
@@ -19,9 +39,7 @@ class UserProgress(db.Model):
     
     # Overall progress metrics
     overall_progress = db.Column(db.Float, default=0.0)  # Percentage
-    completed_modules = db.Column(db.JSON, default=list)  # List of completed module IDs
     total_modules = db.Column(db.Integer, default=0)
-    completed_lessons = db.Column(db.JSON, default=list)  # List of completed lesson IDs
     total_lessons = db.Column(db.Integer, default=0)
     average_score = db.Column(db.Float, default=0.0)
     
@@ -31,8 +49,26 @@ class UserProgress(db.Model):
     last_activity_date = db.Column(db.Date, index=True)  # Indexed for activity queries
     
     # Timestamps
-    created_at = db.Column(db.DateTime, default=datetime.utcnow)
-    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    created_at = db.Column(db.DateTime, server_default=db.func.now())
+    updated_at = db.Column(db.DateTime, server_default=db.text('CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP'), server_onupdate=db.FetchedValue())
+    
+    # Completed modules/lessons live in user_module_progress / user_lesson_progress
+    # (one indexed row per item) instead of JSON lists on this row
+    @property
+    def completed_module_ids(self):
+        """IDs of modules this user has completed"""
+        rows = db.session.query(UserModuleProgress.module_id).filter_by(
+            user_id=self.user_id, is_completed=True
+        )
+        return [module_id for (module_id,) in rows]
+    
+    @property
+    def completed_lesson_ids(self):
+        """IDs of lessons this user has completed"""
+        rows = db.session.query(UserLessonProgress.lesson_id).filter_by(
+            user_id=self.user_id, is_completed=True
+        )
+        return [lesson_id for (lesson_id,) in rows]
     
     def to_dict(self):
         """Convert progress to dictionary"""
@@ -43,9 +79,9 @@ class UserProgress(db.Model):
             'xp': self.xp,
             'learning_streak': self.learning_streak,
             'overall_progress': self.overall_progress,
-            'completed_modules': self.completed_modules,
+            'completed_modules': self.completed_module_ids,
             'total_modules': self.total_modules,
-            'completed_lessons': self.completed_lessons,
+            'completed_lessons': self.completed_lesson_ids,
             'total_lessons': self.total_lessons,
             'average_score': self.average_score,
             'total_learning_time': self.total_learning_time,
@@ -73,15 +109,32 @@ class UserModuleProgress(db.Model):
     is_completed = db.Column(db.Boolean, default=False)
     
     # Timestamps
-    started_at = db.Column(db.DateTime, default=datetime.utcnow)
-    last_accessed = db.Column(db.DateTime, default=datetime.utcnow)
+    started_at = db.Column(db.DateTime, server_default=db.func.now())
+    last_accessed = db.Column(db.DateTime, server_default=db.func.now())
     completed_at = db.Column(db.DateTime)
     
-    # Relationships
-    module = db.relationship('Module', backref='user_progress')
-    
-    # Unique constraint
-    __table_args__ = (db.UniqueConstraint('user_id', 'module_id', name='unique_user_module'),)
+    # Relationships (lazy select; callers that need Module for many rows join it
+    # explicitly, as modules.get_modules does, or pass selectinload/joinedload)
+    module = db.relationship('Module', back_populates='user_progress')
+    
+    # Unique constraint + covering index for completed-module lookups
+    __table_args__ = (
+        db.UniqueConstraint('user_id', 'module_id', name='unique_user_module'),
+        db.Index('ix_user_module_progress_completed', 'user_id', 'is_completed', 'module_id'),
+    )
+    
+    def refresh_from_lessons(self):
+        """
+        Recompute completed_lessons, progress_percentage and completion from
+        the user's lesson rows in the database, then reload this object.
+        Pending changes (including the lesson just completed) are flushed first.
+        """
+        db.session.flush()
+        db.session.execute(
+            _REFRESH_MODULE_PROGRESS_SQL,
+            {'user_id': self.user_id, 'module_id': self.module_id}
+        )
+        db.session.refresh(self)
     
     def to_dict(self):
         """Convert module progress to dictionary"""
@@ -110,7 +163,7 @@ class UserLessonProgress(db.Model):
     lesson_id = db.Column(db.Integer, db.ForeignKey('lessons.id'), nullable=False)
     
     # Progress status
-    status = db.Column(db.String(20), default='not_started')  # not_started, in_progress, completed
+    status = db.Column(db.Enum('not_started', 'in_progress', 'completed', name='lesson_status'), default='not_started')
     progress_percentage = db.Column(db.Float, default=0.0)
     is_completed = db.Column(db.Boolean, default=False)
     
@@ -121,15 +174,19 @@ class UserLessonProgress(db.Model):
     xp_earned = db.Column(db.Integer, default=0)
     
     # Timestamps
-    started_at = db.Column(db.DateTime, default=datetime.utcnow)
-    last_accessed = db.Column(db.DateTime, default=datetime.utcnow)
+    started_at = db.Column(db.DateTime, server_default=db.func.now())
+    last_accessed = db.Column(db.DateTime, server_default=db.func.now())
     completed_at = db.Column(db.DateTime)
     
     # Relationships
-    lesson = db.relationship('Lesson', backref='user_progress')
+    lesson = db.relationship('Lesson', back_populates='user_progress')
     
-    # Unique constraint
-    __table_args__ = (db.UniqueConstraint('user_id', 'lesson_id', name='unique_user_lesson'),)
+    # Unique constraint + covering index for completed-lesson lookups
+    __table_args__ = (
+        db.UniqueConstraint('user_id', 'lesson_id', name='unique_user_lesson'),
+        db.Index('ix_user_lesson_progress_completed', 'user_id', 'is_completed', 'lesson_id'),
+        db.Index('ix_user_lesson_progress_completed_at', 'user_id', 'is_completed', 'completed_at'),  # Recent completions
+    )
     
     def to_dict(self):
         """Convert lesson progress to dictionary"""
@@ -155,6 +212,9 @@ class UserLessonProgress(db.Model):
 class XPTransaction(db.Model):
     """XP transaction history for gamification"""
     __tablename__ = 'xp_transactions'
+    __table_args__ = (
+        db.Index('ix_xp_user_ts', 'user_id', 'timestamp'),  # Composite index for XP history queries
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
@@ -168,7 +228,7 @@ class XPTransaction(db.Model):
     extra_metadata = db.Column(db.JSON)  # Additional context like lesson_id, module_id, etc.
     
     # Timestamp
-    timestamp = db.Column(db.DateTime, default=datetime.utcnow, index=True)
+    timestamp = db.Column(db.DateTime, server_default=db.func.now(), index=True)
     
     def to_dict(self):
         """Convert XP transaction to dictionary"""
@@ -2,7 +2,6 @@
 Quiz and assessment models
 """
 
-from datetime import datetime
 from app import db
 
 class QuizQuestion(db.Model):
@@ -15,22 +14,25 @@ class QuizQuestion(db.Model):
     
     # Question details
     question_text = db.Column(db.Text, nullable=False)
-    question_type = db.Column(db.String(50), nullable=False)  # multiple_choice, true_false, drag_drop, prompt_grader
+    question_type = db.Column(db.Enum('multiple_choice', 'true_false', 'drag_drop', 'prompt_grader', name='quiz_question_type'), nullable=False)
     options = db.Column(db.JSON)  # Array of options for multiple choice
     correct_answer = db.Column(db.JSON)  # Correct answer(s)
     explanation = db.Column(db.Text)  # Explanation for the answer
     
     # Metadata
-    difficulty = db.Column(db.String(20), default='medium')  # easy, medium, hard
+    difficulty = db.Column(db.Enum('easy', 'medium', 'hard', name='quiz_question_difficulty'), default='medium')
     points = db.Column(db.Integer, default=1)
     order_index = db.Column(db.Integer, default=0)
     
     # Status
-    status = db.Column(db.String(20), default='active')  # active, draft, archived
+    status = db.Column(db.Enum('active', 'draft', 'archived', name='quiz_question_status'), default='active')
     
     # Timestamps
-    created_at = db.Column(db.DateTime, default=datetime.utcnow)
-    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    created_at = db.Column(db.DateTime, server_default=db.func.now())
+    updated_at = db.Column(db.DateTime, server_default=db.text('CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP'), server_onupdate=db.FetchedValue())
+    
+    # Relationships
+    answers = db.relationship('QuizAnswer', back_populates='question')
     
     def to_dict(self):
         """Convert quiz question to dictionary"""
@@ -57,6 +59,9 @@ class QuizAttempt(db.Model):
 
     """User quiz attempts"""
     __tablename__ = 'quiz_attempts'
+    __table_args__ = (
+        db.Index('ix_quiz_attempts_user_status', 'user_id', 'status'),  # In-progress attempts per user
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
@@ -70,14 +75,15 @@ class QuizAttempt(db.Model):
     time_spent = db.Column(db.Integer, default=0)  # in seconds
     
     # Status
-    status = db.Column(db.String(20), default='in_progress')  # in_progress, completed, abandoned
+    status = db.Column(db.Enum('in_progress', 'completed', 'abandoned', name='quiz_attempt_status'), default='in_progress')
     
     # Timestamps
-    started_at = db.Column(db.DateTime, default=datetime.utcnow)
+    started_at = db.Column(db.DateTime, server_default=db.func.now())
     submitted_at = db.Column(db.DateTime)
     
     # Relationships
     user = db.relationship('User', backref='quiz_attempts')
+    quiz_answers = db.relationship('QuizAnswer', back_populates='quiz_attempt')  # 'answers' is the JSON column
     
     def to_dict(self):
         """Convert quiz attempt to dictionary"""
@@ -114,11 +120,11 @@ class QuizAnswer(db.Model):
     time_spent = db.Column(db.Integer, default=0)  # in seconds
     
     # Timestamps
-    answered_at = db.Column(db.DateTime, default=datetime.utcnow)
+    answered_at = db.Column(db.DateTime, server_default=db.func.now())
     
     # Relationships
-    quiz_attempt = db.relationship('QuizAttempt')
-    question = db.relationship('QuizQuestion', backref='answers')
+    quiz_attempt = db.relationship('QuizAttempt', back_populates='quiz_answers')
+    question = db.relationship('QuizQuestion', back_populates='answers')
     
     def to_dict(self):
         """Convert quiz answer to dictionary"""
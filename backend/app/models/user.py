@@ -3,13 +3,25 @@ User-related database models
 """
 
 from datetime import datetime
+from sqlalchemy.orm import deferred
 from app import db
-from werkzeug.security import generate_password_hash, check_password_hash
-import uuid
+from werkzeug.security import check_password_hash
+from argon2 import PasswordHasher
+from argon2.exceptions import InvalidHash, VerificationError
+
+# argon2id tuned for login latency: 2 passes over 19 MiB, single lane
+_password_hasher = PasswordHasher(time_cost=2, memory_cost=19 * 1024, parallelism=1)
+
+ADMIN_TYPES = ('super_admin', 'content_admin', 'moderator')
 
 class User(db.Model):
     """User model for authentication and profile management"""
     __tablename__ = 'users'
+    __table_args__ = (
+        db.Index('ix_users_active_xp', 'is_active', 'total_xp'),  # Leaderboard: active users ranked by XP
+        db.Index('ix_users_level_xp', 'level', 'total_xp'),  # Level-filtered rankings
+        db.Index('ix_users_active_login', 'is_active', 'last_login'),  # Recently active users
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     email = db.Column(db.String(120), unique=True, nullable=False, index=True)
@@ -32,7 +44,7 @@ class User(db.Model):
     
     # Admin status
     is_admin = db.Column(db.Boolean, default=False)
-    admin_type = db.Column(db.String(50))  # 'super_admin', 'content_admin', 'moderator'
+    admin_type = db.Column(db.Enum(*ADMIN_TYPES, name='admin_type'))
     
     # Account status
     is_active = db.Column(db.Boolean, default=True)
@@ -45,8 +57,8 @@ class User(db.Model):
     timezone = db.Column(db.String(50), default='UTC')
     
     # Timestamps
-    created_at = db.Column(db.DateTime, default=datetime.utcnow)
-    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    created_at = db.Column(db.DateTime, server_default=db.func.now())
+    updated_at = db.Column(db.DateTime, server_default=db.text('CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP'), server_onupdate=db.FetchedValue())
     
     # Relationships - Phase 1 MVP only
     sessions = db.relationship('UserSession', backref='user', lazy='dynamic', cascade='all, delete-orphan')
@@ -64,12 +76,29 @@ class User(db.Model):
     # subscription = db.relationship('UserSubscription', back_populates='user', uselist=False, cascade='all, delete-orphan')
     
     def set_password(self, password):
-        """Hash and set password"""
-        self.password_hash = generate_password_hash(password)
+        """Hash and set password (argon2id)"""
+        self.password_hash = _password_hasher.hash(password)
     
     def check_password(self, password):
-        """Check password against hash"""
-        return check_password_hash(self.password_hash, password)
+        """
+        Check password against hash.
+        
+        Legacy werkzeug (pbkdf2/scrypt) hashes and argon2 hashes with outdated
+        parameters are re-hashed on success; the caller's commit persists it.
+        """
+        if self.password_hash.startswith('$argon2'):
+            try:
+                _password_hasher.verify(self.password_hash, password)
+            except (VerificationError, InvalidHash):
+                return False
+            if _password_hasher.check_needs_rehash(self.password_hash):
+                self.set_password(password)
+        else:
+            if not check_password_hash(self.password_hash, password):
+                return False
+            self.set_password(password)
+        
+        return True
     
     def to_dict(self, include_sensitive=False):
         """Convert user to dictionary"""
@@ -144,8 +173,8 @@ class UserSession(db.Model):
     expires_at = db.Column(db.DateTime, nullable=False)
     is_active = db.Column(db.Boolean, default=True)
     ip_address = db.Column(db.String(45))
-    user_agent = db.Column(db.Text)
-    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    user_agent = deferred(db.Column(db.Text))  # Not part of to_dict; loaded on access
+    created_at = db.Column(db.DateTime, server_default=db.func.now())
     
     def is_expired(self):
         """Check if session is expired"""
@@ -177,10 +206,10 @@ class UserActivityLog(db.Model):
     action = db.Column(db.String(100), nullable=False, index=True)
     description = db.Column(db.Text)
     ip_address = db.Column(db.String(45))
-    user_agent = db.Column(db.Text)
+    user_agent = deferred(db.Column(db.Text))  # Not part of to_dict; loaded on access
     extra_metadata = db.Column(db.JSON)  # Additional context data
     xp_earned = db.Column(db.Integer, default=0)
-    timestamp = db.Column(db.DateTime, default=datetime.utcnow, index=True)
+    timestamp = db.Column(db.DateTime, server_default=db.func.now(), index=True)
     
     def to_dict(self):
         """Convert activity log to dictionary"""
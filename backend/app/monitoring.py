@@ -5,32 +5,17 @@ Integrates Sentry, structured logging, and metrics collection
 
 import os
 import time
+import atexit
 import logging
-from flask import request, g
+import threading
+import zlib
+from collections import Counter
+from flask import request, g, has_request_context, jsonify
 from flask_jwt_extended import get_jwt_identity
+from app.middleware import current_identity
+from app.utils.async_logging import enable_queue_logging
 from functools import wraps
 
-# Make Sentry optional for local development
-try:
-    import sentry_sdk
-    from sentry_sdk.integrations.flask import FlaskIntegration
-    from sentry_sdk.integrations.sqlalchemy import SqlalchemyIntegration
-    from sentry_sdk.integrations.redis import RedisIntegration
-    
-    # Try to import Celery integration, but don't fail if it's not available
-    try:
-        from sentry_sdk.integrations.celery import CeleryIntegration
-        CELERY_INTEGRATION = CeleryIntegration()
-    except:
-        CELERY_INTEGRATION = None
-    
-    SENTRY_AVAILABLE = True
-except ImportError:
-    SENTRY_AVAILABLE = False
-    CELERY_INTEGRATION = None
-    # Sentry is optional - used for production error tracking
-    # No warning needed in development mode
-
 logger = logging.getLogger(__name__)
 
 
@@ -47,19 +32,29 @@ def init_monitoring(app):
     """
     
     # 1. Initialize Sentry if DSN is configured and Sentry is available
-    # Try to get DSN from database first, fallback to environment variable
-    sentry_dsn = None
-    try:
-        from app.services.credential_service import credential_service
-        sentry_dsn = credential_service.get_sentry_dsn()
-    except Exception as e:
-        logger.debug(f"Could not load Sentry DSN from database: {e}")
-    
-    # Fallback to environment variable if not in database
+    # Environment variable first (free), database credential store only if unset
+    sentry_dsn = os.getenv('SENTRY_DSN')
     if not sentry_dsn:
-        sentry_dsn = os.getenv('SENTRY_DSN')
+        try:
+            from app.services.credential_service import credential_service
+            sentry_dsn = credential_service.get_sentry_dsn()
+        except Exception as e:
+            logger.debug(f"Could not load Sentry DSN from database: {e}")
+    
+    # Sentry is optional and only imported when a DSN is configured,
+    # so local development and CI don't pay for loading the SDK
+    sentry_sdk = None
+    if sentry_dsn:
+        try:
+            import sentry_sdk
+            from sentry_sdk.integrations.flask import FlaskIntegration
+            from sentry_sdk.integrations.sqlalchemy import SqlalchemyIntegration
+            from sentry_sdk.integrations.redis import RedisIntegration
+        except ImportError:
+            logger.warning("SENTRY_DSN is configured but sentry-sdk is not installed - error tracking disabled")
+            sentry_dsn = None
     
-    if SENTRY_AVAILABLE and sentry_dsn:
+    if sentry_dsn:
         # Build integrations list, only including available ones
         integrations = [
             FlaskIntegration(),
@@ -68,15 +63,28 @@ def init_monitoring(app):
         ]
         
         # Add Celery integration only if available
-        if CELERY_INTEGRATION:
-            integrations.append(CELERY_INTEGRATION)
+        try:
+            from sentry_sdk.integrations.celery import CeleryIntegration
+            integrations.append(CeleryIntegration())
+        except Exception:
+            pass
+        
+        # Probes and static assets are never traced; everything else is sampled at the configured rate
+        excluded_paths = frozenset(
+            path.strip()
+            for path in os.getenv(
+                'SENTRY_TRACES_EXCLUDE_PATHS',
+                '/api/v1/health,/api/v1/health/ready,/api/v1/health/live,/metrics,/favicon.ico'
+            ).split(',')
+            if path.strip()
+        )
         
         sentry_sdk.init(
             dsn=sentry_dsn,
             integrations=integrations,
             # Performance monitoring
-            traces_sample_rate=float(os.getenv('SENTRY_TRACES_SAMPLE_RATE', '0.1')),
-            profiles_sample_rate=float(os.getenv('SENTRY_PROFILES_SAMPLE_RATE', '0.1')),
+            traces_sampler=_make_sampler(float(os.getenv('SENTRY_TRACES_SAMPLE_RATE', '0.1')), excluded_paths),
+            profiles_sampler=_make_sampler(float(os.getenv('SENTRY_PROFILES_SAMPLE_RATE', '0.1')), excluded_paths),
             
             # Environment configuration
             environment=os.getenv('FLASK_ENV', 'development'),
@@ -93,110 +101,273 @@ def init_monitoring(app):
         # In production, set SENTRY_DSN environment variable to enable error tracking
         pass
     
-    # 2. Request timing middleware
+    # Frozen at init so the per-request hooks test a plain bool
+    sentry_enabled = bool(sentry_dsn)
+    
+    # 2. OpenTelemetry tracing (optional) - request spans are timed by the
+    # instrumentation and exported in batches off the request thread
+    otel_enabled = _init_opentelemetry(app)
+    
+    # 3. Request timing middleware
+    _install_request_record_factory()
+    
+    # Structured logs for log shippers: LOG_FORMAT=json renders records (and their extra fields) as JSON
+    if os.getenv('LOG_FORMAT', '').lower() == 'json':
+        from app.utils.json_logging import enable_json_logging
+        enable_json_logging(os.getenv('LOG_LEVEL', 'INFO').upper())
+    
+    # Request logs are written by a QueueListener thread; the request thread only enqueues
+    enable_queue_logging(logger)
+    
+    # Read once at startup; compared in integer nanoseconds on every response
+    slow_threshold_ns = int(float(os.getenv('SLOW_REQUEST_THRESHOLD_MS', '2000')) * 1_000_000)
+    
     @app.before_request
     def start_timer():
         """Start timer for request duration tracking"""
-        g.start_time = time.time()
-        g.request_id = request.headers.get('X-Request-ID', generate_request_id())
+        g.start_ns = time.perf_counter_ns()
+        g.request_id = request.headers.get('X-Request-ID') or generate_request_id()
     
     @app.after_request
     def log_request(response):
         """Log request completion with timing and context"""
-        if hasattr(g, 'start_time'):
-            duration = time.time() - g.start_time
-            duration_ms = duration * 1000
-            
-            # Get user ID if authenticated
-            try:
-                user_id = get_jwt_identity()
-            except:
-                user_id = None
+        start_ns = g.get('start_ns')
+        if start_ns is not None:
+            elapsed_ns = time.perf_counter_ns() - start_ns
+            duration_ms = elapsed_ns / 1_000_000
+            request_id = getattr(g, 'request_id', 'unknown')
             
-            # Structured log entry
-            log_data = {
-                'request_id': getattr(g, 'request_id', 'unknown'),
-                'method': request.method,
-                'path': request.path,
-                'status': response.status_code,
-                'duration_ms': round(duration_ms, 2),
-                'user_id': user_id,
-                'ip': request.remote_addr,
-                'user_agent': request.headers.get('User-Agent', 'unknown')[:100]
-            }
-            
-            # Log at appropriate level
-            if response.status_code >= 500:
-                logger.error('request_completed', extra=log_data)
-            elif response.status_code >= 400:
-                logger.warning('request_completed', extra=log_data)
+            status = response.status_code
+            if status >= 500:
+                level = logging.ERROR
+            elif status >= 400:
+                level = logging.WARNING
             else:
-                logger.info('request_completed', extra=log_data)
+                level = logging.INFO
+            is_slow = elapsed_ns > slow_threshold_ns
+            
+            # Successful requests are already recorded as spans when OpenTelemetry is on
+            should_log = logger.isEnabledFor(level) and not (otel_enabled and level == logging.INFO)
             
-            # Alert on slow requests
-            slow_threshold = float(os.getenv('SLOW_REQUEST_THRESHOLD_MS', '2000'))
-            if duration_ms > slow_threshold:
-                logger.warning(f'Slow request detected: {request.path} took {duration_ms:.2f}ms', extra=log_data)
+            if is_slow or should_log:
+                # Structured fields go in extra= for the formatter to render;
+                # request_id is added by the record factory
+                req = request._get_current_object()
                 
-                # Send to Sentry as performance issue
-                if sentry_dsn:
-                    with sentry_sdk.push_scope() as scope:
-                        scope.set_context("request", log_data)
-                        sentry_sdk.capture_message(
-                            f"Slow request: {request.method} {request.path}",
-                            level="warning"
-                        )
+                # Get user ID if authenticated - already resolved by the middleware;
+                # only ask Flask-JWT-Extended when a decorator verified a token itself
+                user_id = current_identity()
+                if user_id is None and '_jwt_extended_jwt' in g:
+                    try:
+                        user_id = get_jwt_identity()
+                    except Exception:
+                        user_id = None
+                
+                # Structured log entry
+                log_data = {
+                    'method': req.method,
+                    'path': req.path,
+                    'status': status,
+                    'duration_ms': round(duration_ms, 2),
+                    'user_id': user_id,
+                    'ip': req.remote_addr,
+                    'user_agent': req.headers.get('User-Agent', 'unknown')[:100]
+                }
+                
+                # Log at appropriate level
+                if should_log:
+                    logger.log(level, 'request_completed', extra=log_data)
+                
+                # Alert on slow requests
+                if is_slow:
+                    logger.warning('Slow request detected: %s took %.2fms', req.path, duration_ms, extra=log_data)
+                    
+                    # Send to Sentry as performance issue
+                    if sentry_enabled:
+                        with sentry_sdk.push_scope() as scope:
+                            scope.set_context("request", dict(log_data, request_id=request_id))
+                            sentry_sdk.capture_message(
+                                f"Slow request: {req.method} {req.path}",
+                                level="warning"
+                            )
             
             # Add custom headers for observability
-            response.headers['X-Request-ID'] = log_data['request_id']
+            response.headers['X-Request-ID'] = request_id
             response.headers['X-Response-Time'] = str(duration_ms)
         
         return response
     
-    # 3. Error handler integration
+    # 4. Error handler integration
     @app.errorhandler(Exception)
     def handle_exception(error):
         """Global error handler with Sentry integration"""
+        request_id = getattr(g, 'request_id', 'unknown')
         logger.exception('Unhandled exception', extra={
             'error_type': type(error).__name__,
             'error_message': str(error),
-            'request_id': getattr(g, 'request_id', 'unknown'),
             'path': request.path,
             'method': request.method
         })
         
-        # Send to Sentry
-        if sentry_dsn:
+        # Send to Sentry - explicit because FlaskIntegration only captures exceptions
+        # that reach Flask's own handler, and this handler consumes them first
+        if sentry_enabled:
             sentry_sdk.capture_exception(error)
         
         # Return error response
-        from flask import jsonify
         return jsonify({
             'error': 'Internal server error',
-            'request_id': getattr(g, 'request_id', 'unknown')
+            'request_id': request_id
         }), 500
 
 
+def _install_request_record_factory():
+    """
+    Stamp every log record with the current request's id (None outside requests)
+    
+    Request-scoped records then carry request_id without each call building
+    an extra= dict; extra dicts must not repeat the request_id key.
+    """
+    base_factory = logging.getLogRecordFactory()
+    if getattr(base_factory, 'adds_request_id', False):
+        return
+    
+    def factory(*args, **kwargs):
+        record = base_factory(*args, **kwargs)
+        record.request_id = g.get('request_id') if has_request_context() else None
+        return record
+    
+    factory.adds_request_id = True
+    logging.setLogRecordFactory(factory)
+
+
+def _init_opentelemetry(app):
+    """
+    Instrument the app with OpenTelemetry when OTEL_EXPORTER_OTLP_ENDPOINT is set
+    
+    Returns:
+        bool: True if tracing was enabled
+    """
+    endpoint = os.getenv('OTEL_EXPORTER_OTLP_ENDPOINT')
+    if not endpoint:
+        return False
+    
+    try:
+        from opentelemetry import trace
+        from opentelemetry.sdk.resources import Resource
+        from opentelemetry.sdk.trace import TracerProvider
+        from opentelemetry.sdk.trace.export import BatchSpanProcessor
+        from opentelemetry.exporter.otlp.proto.grpc.trace_exporter import OTLPSpanExporter
+        from opentelemetry.instrumentation.flask import FlaskInstrumentor
+    except ImportError:
+        logger.warning("OTEL_EXPORTER_OTLP_ENDPOINT is configured but OpenTelemetry is not installed - tracing disabled")
+        return False
+    
+    provider = TracerProvider(resource=Resource.create({
+        'service.name': os.getenv('OTEL_SERVICE_NAME', 'neural-learning-backend')
+    }))
+    provider.add_span_processor(BatchSpanProcessor(OTLPSpanExporter(endpoint=endpoint)))
+    trace.set_tracer_provider(provider)
+    FlaskInstrumentor().instrument_app(app)
+    
+    logger.info(f"OpenTelemetry tracing initialized (exporting to {endpoint})")
+    return True
+
+
+def _make_sampler(sample_rate, excluded_paths):
+    """
+    Build a Sentry sampler callable
+    
+    Excluded paths get 0.0; an inbound sampling decision (sentry-trace header)
+    is honoured so distributed traces stay complete. Requests carrying an
+    X-Request-ID are sampled deterministically by its hash, so every service
+    seeing the same id makes the same keep/drop decision; otherwise sample_rate.
+    """
+    def sampler(sampling_context):
+        environ = sampling_context.get('wsgi_environ', {})
+        if environ.get('PATH_INFO', '') in excluded_paths:
+            return 0.0
+        parent_sampled = sampling_context.get('parent_sampled')
+        if parent_sampled is not None:
+            return float(parent_sampled)
+        request_id = environ.get('HTTP_X_REQUEST_ID')
+        if request_id:
+            return 1.0 if zlib.crc32(request_id.encode()) / 2**32 < sample_rate else 0.0
+        return sample_rate
+    return sampler
+
+
 def generate_request_id():
-    """Generate unique request ID for tracing"""
-    import uuid
-    return str(uuid.uuid4())
+    """Generate unique request ID for tracing (16 hex chars, same width as a W3C span id)"""
+    return os.urandom(8).hex()
+
+
+# Custom metrics are summed in memory per (name, tags) and flushed to the log
+# periodically, so hot paths (cache hits/misses) pay a counter update, not a log write
+METRICS_FLUSH_INTERVAL = float(os.getenv('METRICS_FLUSH_INTERVAL', '10'))
+
+_metric_totals = Counter()
+_metric_counts = Counter()
+_metrics_lock = threading.Lock()
+_metrics_flusher_started = False
+
+
+def _metrics_flush_worker():
+    while True:
+        time.sleep(METRICS_FLUSH_INTERVAL)
+        try:
+            flush_metrics()
+        except Exception as e:
+            logger.warning(f'Failed to flush metrics: {e}')
+
+
+def _start_metrics_flusher():
+    global _metrics_flusher_started
+    with _metrics_lock:
+        if _metrics_flusher_started:
+            return
+        _metrics_flusher_started = True
+    threading.Thread(target=_metrics_flush_worker, daemon=True, name='metrics-flush').start()
+    atexit.register(flush_metrics)
+
+
+def flush_metrics():
+    """Log the aggregated custom metrics (one record per name/tags) and reset them"""
+    with _metrics_lock:
+        totals = _metric_totals.copy()
+        counts = _metric_counts.copy()
+        _metric_totals.clear()
+        _metric_counts.clear()
+    
+    for key, total in totals.items():
+        metric_name, tags = key
+        logger.info('metric.%s', metric_name, extra={
+            'metric_name': metric_name,
+            'value': total,
+            'count': counts[key],
+            'tags': dict(tags)
+        })
 
 
 def track_custom_metric(metric_name, value, tags=None):
     """
     Track custom metrics
     
+    Values are summed per metric name and tag set and flushed every
+    METRICS_FLUSH_INTERVAL seconds.
+    
     Args:
         metric_name: Name of the metric
         value: Metric value
         tags: Optional tags dict
     """
-    logger.info(f'metric.{metric_name}', extra={
-        'metric_name': metric_name,
-        'value': value,
-        'tags': tags or {}
-    })
+    if not _metrics_flusher_started:
+        _start_metrics_flusher()
+    
+    key = (metric_name, tuple(sorted(tags.items())) if tags else ())
+    with _metrics_lock:
+        _metric_totals[key] += value
+        _metric_counts[key] += 1
 
 
 def track_ai_usage(user_id, model, tokens_used, cost, endpoint):
@@ -217,7 +388,7 @@ def track_ai_usage(user_id, model, tokens_used, cost, endpoint):
 def monitor_database_query(query_type, duration_ms, table=None):
     """Monitor database query performance"""
     if duration_ms > 1000:  # Slow query threshold
-        logger.warning(f'Slow database query: {query_type}', extra={
+        logger.warning('Slow database query: %s', query_type, extra={
             'query_type': query_type,
             'duration_ms': duration_ms,
             'table': table
@@ -249,57 +420,97 @@ def monitor_function(metric_name=None):
     """
     Decorator to monitor function execution time
     
+    Duration and success/error counts go through the track_custom_metric
+    aggregator rather than one log record per call.
+    
     Usage:
         @monitor_function('my_function')
         def my_function():
             pass
     """
     def decorator(func):
+        name = metric_name or func.__name__
+        calls_metric = f'function.{name}'
+        duration_metric = f'function.{name}.duration_ms'
+        success_tags = {'status': 'success'}
+        
         @wraps(func)
         def wrapper(*args, **kwargs):
-            start_time = time.time()
-            name = metric_name or func.__name__
+            start_ns = time.perf_counter_ns()
+            error_type = None
             
             try:
-                result = func(*args, **kwargs)
-                duration_ms = (time.time() - start_time) * 1000
-                
-                track_custom_metric(f'function.{name}.duration', duration_ms)
-                track_custom_metric(f'function.{name}.success', 1)
-                
-                return result
+                return func(*args, **kwargs)
             except Exception as e:
-                duration_ms = (time.time() - start_time) * 1000
-                
-                track_custom_metric(f'function.{name}.duration', duration_ms)
-                track_custom_metric(f'function.{name}.error', 1, tags={
-                    'error_type': type(e).__name__
-                })
-                
+                error_type = type(e).__name__
                 raise
+            finally:
+                track_custom_metric(duration_metric, (time.perf_counter_ns() - start_ns) / 1_000_000)
+                track_custom_metric(calls_metric, 1, tags=(
+                    {'status': 'error', 'error_type': error_type} if error_type else success_tags
+                ))
         
         return wrapper
     return decorator
 
 
 # Health check metrics
+# Sampled by a background thread so callers never block on psutil.cpu_percent
+SYSTEM_METRICS_INTERVAL = float(os.getenv('SYSTEM_METRICS_INTERVAL', '5'))
+
+_system_metrics = {}
+_system_metrics_lock = threading.Lock()
+_system_metrics_started = False
+
+
+def _sample_system_metrics(psutil, cpu_interval=None):
+    return {
+        'cpu_percent': psutil.cpu_percent(interval=cpu_interval),
+        'memory_percent': psutil.virtual_memory().percent,
+        'disk_percent': psutil.disk_usage('/').percent,
+        'timestamp': time.time()
+    }
+
+
+def _system_metrics_worker(psutil):
+    """Refresh the cached snapshot every SYSTEM_METRICS_INTERVAL seconds"""
+    global _system_metrics
+    while True:
+        time.sleep(SYSTEM_METRICS_INTERVAL)
+        try:
+            # interval=None: CPU usage since the previous sample, no blocking
+            _system_metrics = _sample_system_metrics(psutil)
+        except Exception as e:
+            logger.warning(f'Failed to collect system metrics: {e}')
+
+
 def get_system_metrics():
     """
     Collect system metrics for health monitoring
     
+    The first call takes a blocking 100ms CPU sample and starts the sampler
+    thread; later calls return the latest cached snapshot.
+    
     Returns:
         dict: System metrics
     """
-    import psutil
+    global _system_metrics, _system_metrics_started
     
     try:
-        metrics = {
-            'cpu_percent': psutil.cpu_percent(interval=0.1),
-            'memory_percent': psutil.virtual_memory().percent,
-            'disk_percent': psutil.disk_usage('/').percent,
-            'timestamp': time.time()
-        }
-        return metrics
+        if not _system_metrics_started:
+            import psutil
+            
+            with _system_metrics_lock:
+                if not _system_metrics_started:
+                    _system_metrics = _sample_system_metrics(psutil, cpu_interval=0.1)
+                    threading.Thread(
+                        target=_system_metrics_worker,
+                        args=(psutil,),
+                        daemon=True,
+                        name='system-metrics'
+                    ).start()
+                    _system_metrics_started = True
+        return dict(_system_metrics)
     except Exception as e:
         logger.error(f'Failed to collect system metrics: {e}')
         return {}
@@ -314,6 +525,12 @@ ALERT_THRESHOLDS = {
     'disk_percent': float(os.getenv('ALERT_DISK_PERCENT', '85')),
 }
 
+# (metric, warning threshold, critical threshold) - critical is 20% above warning
+_ALERT_RULES = tuple(
+    (metric_name, threshold, threshold * 1.2)
+    for metric_name, threshold in ALERT_THRESHOLDS.items()
+)
+
 
 def check_alert_thresholds(metrics):
     """
@@ -327,17 +544,23 @@ def check_alert_thresholds(metrics):
     """
     alerts = []
     
-    for metric_name, threshold in ALERT_THRESHOLDS.items():
-        if metric_name in metrics and metrics[metric_name] > threshold:
-            alert = {
-                'metric': metric_name,
-                'current_value': metrics[metric_name],
-                'threshold': threshold,
-                'severity': 'critical' if metrics[metric_name] > threshold * 1.2 else 'warning'
-            }
-            alerts.append(alert)
-            
-            logger.error(f'Alert: {metric_name} = {metrics[metric_name]} exceeds threshold {threshold}')
+    for metric_name, threshold, critical_threshold in _ALERT_RULES:
+        value = metrics.get(metric_name)
+        if value is None or value <= threshold:
+            continue
+        alerts.append({
+            'metric': metric_name,
+            'current_value': value,
+            'threshold': threshold,
+            'severity': 'critical' if value > critical_threshold else 'warning'
+        })
+    
+    # One record for the whole check instead of one per breached metric
+    if alerts:
+        logger.error('Alert: %s', '; '.join(
+            f"{alert['metric']} = {alert['current_value']} exceeds threshold {alert['threshold']}"
+            for alert in alerts
+        ))
     
     return alerts
 
@@ -6,60 +6,76 @@ Adds comprehensive security headers to all responses
 from flask import request, g
 
 
+# Content Security Policy
+# HIGH-002 Fix: Removed 'unsafe-inline' and 'unsafe-eval' for better XSS protection
+# Note: If inline scripts/styles are needed, implement CSP nonces instead
+_CSP_POLICY = (
+    "default-src 'self'; "
+    "script-src 'self' https://cdn.jsdelivr.net https://cdnjs.cloudflare.com; "
+    "style-src 'self' https://fonts.googleapis.com; "
+    "font-src 'self' https://fonts.gstatic.com; "
+    "img-src 'self' data: https: blob:; "
+    "connect-src 'self' https://api.openai.com https://api.anthropic.com https://api.groq.com wss: ws:; "
+    "frame-ancestors 'none'; "
+    "base-uri 'self'; "
+    "form-action 'self';"
+)
+
+# Permissions Policy (formerly Feature Policy)
+_PERMISSIONS_POLICY = (
+    "geolocation=(), "
+    "microphone=(), "
+    "camera=(), "
+    "payment=(), "
+    "usb=()"
+)
+
+# Headers that are identical on every response, built once at import
+_STATIC_HEADERS = {
+    'Content-Security-Policy': _CSP_POLICY,
+    'X-Content-Type-Options': 'nosniff',  # Prevent MIME type sniffing
+    'X-Frame-Options': 'DENY',  # Prevent clickjacking
+    'X-XSS-Protection': '1; mode=block',  # XSS Protection (legacy but still useful)
+    'Referrer-Policy': 'strict-origin-when-cross-origin',
+    'Permissions-Policy': _PERMISSIONS_POLICY,
+}
+
+_HSTS_POLICY = 'max-age=31536000; includeSubDomains; preload'
+
+# Server information removed from every response (lowercase for comparison)
+_STRIPPED_HEADERS = frozenset(('server', 'x-powered-by'))
+
+
 def add_security_headers(response):
     """Add security headers to all responses"""
-    
-    # Content Security Policy
-    # HIGH-002 Fix: Removed 'unsafe-inline' and 'unsafe-eval' for better XSS protection
-    # Note: If inline scripts/styles are needed, implement CSP nonces instead
-    csp_policy = (
-        "default-src 'self'; "
-        "script-src 'self' https://cdn.jsdelivr.net https://cdnjs.cloudflare.com; "
-        "style-src 'self' https://fonts.googleapis.com; "
-        "font-src 'self' https://fonts.gstatic.com; "
-        "img-src 'self' data: https: blob:; "
-        "connect-src 'self' https://api.openai.com https://api.anthropic.com https://api.groq.com wss: ws:; "
-        "frame-ancestors 'none'; "
-        "base-uri 'self'; "
-        "form-action 'self';"
-    )
-    response.headers['Content-Security-Policy'] = csp_policy
+    response.headers.update(_STATIC_HEADERS)
     
     # HTTP Strict Transport Security (HSTS)
     # Only in production with HTTPS
     if request.is_secure:
-        response.headers['Strict-Transport-Security'] = 'max-age=31536000; includeSubDomains; preload'
-    
-    # Prevent MIME type sniffing
-    response.headers['X-Content-Type-Options'] = 'nosniff'
+        response.headers['Strict-Transport-Security'] = _HSTS_POLICY
     
-    # Prevent clickjacking
-    response.headers['X-Frame-Options'] = 'DENY'
-    
-    # XSS Protection (legacy but still useful)
-    response.headers['X-XSS-Protection'] = '1; mode=block'
-    
-    # Referrer Policy
-    response.headers['Referrer-Policy'] = 'strict-origin-when-cross-origin'
-    
-    # Permissions Policy (formerly Feature Policy)
-    permissions_policy = (
-        "geolocation=(), "
-        "microphone=(), "
-        "camera=(), "
-        "payment=(), "
-        "usb=()"
-    )
-    response.headers['Permissions-Policy'] = permissions_policy
+    return response
+
+
+class StripServerHeadersMiddleware:
+    """
+    WSGI middleware that removes server-identifying headers in one pass
+    over the final header list, after Flask has built the response
+    """
     
-    # Remove server information
-    response.headers.pop('Server', None)
-    response.headers.pop('X-Powered-By', None)
+    def __init__(self, wsgi_app):
+        self.wsgi_app = wsgi_app
     
-    return response
+    def __call__(self, environ, start_response):
+        def filtered_start_response(status, headers, exc_info=None):
+            headers = [(name, value) for name, value in headers if name.lower() not in _STRIPPED_HEADERS]
+            return start_response(status, headers, exc_info)
+        return self.wsgi_app(environ, filtered_start_response)
 
 
 def init_security_headers(app):
     """Initialize security headers middleware"""
     app.after_request(add_security_headers)
+    app.wsgi_app = StripServerHeadersMiddleware(app.wsgi_app)
     app.logger.info("Security headers middleware initialized")
@@ -0,0 +1,155 @@
+"""
+Batched user activity logging
+Activity rows are queued by request handlers and bulk-inserted by a background worker
+"""
+
+import atexit
+import queue
+import threading
+import time
+import logging
+from datetime import datetime
+
+logger = logging.getLogger(__name__)
+
+# Flush when this many rows are pending or this many seconds have passed
+ACTIVITY_BATCH_SIZE = 200
+ACTIVITY_FLUSH_INTERVAL = 0.5
+# Upper bound on how long interpreter shutdown waits for queued rows to be written
+ACTIVITY_DRAIN_TIMEOUT = 5.0
+
+_activity_queue = queue.Queue(maxsize=10000)
+_activity_worker_thread = None
+_dropped_activity_count = 0
+_dropped_lock = threading.Lock()
+
+
+def enqueue_activity(user_id, action, description=None, ip_address=None, user_agent=None, extra_metadata=None):
+    """
+    Queue a UserActivityLog row for the background writer.
+
+    Never blocks the request: when the queue is full the row is dropped
+    and counted (see get_dropped_activity_count).
+    """
+    global _dropped_activity_count
+    try:
+        _activity_queue.put_nowait({
+            'user_id': user_id,
+            'action': action,
+            'description': description,
+            'ip_address': ip_address,
+            'user_agent': user_agent,
+            'extra_metadata': extra_metadata,
+            'timestamp': datetime.utcnow(),
+        })
+    except queue.Full:
+        with _dropped_lock:
+            _dropped_activity_count += 1
+        logger.warning(f"Activity log queue full - dropped '{action}' for user {user_id}")
+
+
+def get_dropped_activity_count():
+    """Number of activity rows dropped because the queue was full"""
+    return _dropped_activity_count
+
+
+def start_activity_log_worker(app):
+    """Start the background thread that flushes queued activity rows"""
+    global _activity_worker_thread
+
+    if _activity_worker_thread is None:
+        atexit.register(_drain_activity_queue, app)
+
+    if _activity_worker_thread is None or not _activity_worker_thread.is_alive():
+        _activity_worker_thread = threading.Thread(
+            target=_process_activity_queue, args=(app,), daemon=True
+        )
+        _activity_worker_thread.start()
+        logger.info("Activity log worker thread started")
+
+
+def _next_batch():
+    """Block for the first row, then collect more until the batch is full or the interval ends"""
+    batch = [_activity_queue.get()]
+    deadline = time.monotonic() + ACTIVITY_FLUSH_INTERVAL
+    while len(batch) < ACTIVITY_BATCH_SIZE:
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            break
+        try:
+            batch.append(_activity_queue.get(timeout=remaining))
+        except queue.Empty:
+            break
+    return batch
+
+
+def _write_batch(app, batch):
+    """
+    Insert a batch in one transaction; if that fails, retry row by row
+    so only the offending rows (e.g. FK to a deleted user) are lost.
+    """
+    from app import db
+    from app.models.user import UserActivityLog
+
+    # Core INSERT + executemany: PyMySQL rewrites it into multi-row
+    # INSERT ... VALUES (...), (...) statements, skipping ORM bulk bookkeeping
+    insert_stmt = UserActivityLog.__table__.insert()
+
+    with app.app_context():
+        try:
+            try:
+                db.session.execute(insert_stmt, batch)
+                db.session.commit()
+                return
+            except Exception as e:
+                db.session.rollback()
+                logger.warning(f"Batch insert of {len(batch)} activity log rows failed, retrying individually: {e}")
+
+            for row in batch:
+                try:
+                    db.session.execute(insert_stmt, row)
+                    db.session.commit()
+                except Exception as e:
+                    db.session.rollback()
+                    logger.error(f"Dropped activity log row '{row['action']}' for user {row['user_id']}: {e}")
+        finally:
+            db.session.remove()
+
+
+def _process_activity_queue(app):
+    """Background worker: write queued activity rows in one transaction per batch"""
+    while True:
+        batch = _next_batch()
+        try:
+            _write_batch(app, batch)
+        except Exception as e:
+            logger.error(f"Failed to write {len(batch)} activity log rows: {e}", exc_info=True)
+        for _ in batch:
+            _activity_queue.task_done()
+
+
+def _drain_activity_queue(app, timeout=ACTIVITY_DRAIN_TIMEOUT):
+    """atexit hook: flush rows still queued at shutdown, giving up after timeout seconds"""
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        batch = []
+        while len(batch) < ACTIVITY_BATCH_SIZE:
+            try:
+                batch.append(_activity_queue.get_nowait())
+            except queue.Empty:
+                break
+        if not batch:
+            break
+        try:
+            _write_batch(app, batch)
+        except Exception as e:
+            logger.error(f"Failed to flush {len(batch)} activity log rows at shutdown: {e}")
+        for _ in batch:
+            _activity_queue.task_done()
+
+    # Let a batch the worker thread is already writing finish
+    while _activity_queue.unfinished_tasks and time.monotonic() < deadline:
+        time.sleep(0.05)
+
+    if _activity_queue.unfinished_tasks:
+        logger.warning(f"Shutdown drain timed out with {_activity_queue.unfinished_tasks} activity log rows unwritten")
@@ -4,17 +4,117 @@ Provides a single interface for all AI operations across different providers
 """
 
 import os
+import hashlib
+import inspect
+import logging
+import string
+import threading
+import traceback
 import requests
-from openai import OpenAI
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from openai import OpenAI, APIError
 from typing import Dict, List, Optional, Any, Tuple
 from flask import current_app
+from cachetools import TTLCache, LRUCache
+from sqlalchemy import event
 from app import db
 from app.models.api_keys import APIKey
 from app.models.ai_tools import AIToolModel, AITool
 from app.utils.tool_model_resolver import resolve_tool_model, TOOL_PATH_TO_NAME
+from app.utils.security import sanitize_error_message
+from app.utils.commit_hooks import defer_until_commit, on_commit
 from datetime import datetime
 import json
 
+logger = logging.getLogger(__name__)
+
+# orjson (optional) for provider request/response bodies and model JSON output
+try:
+    import orjson
+    _json_loads = orjson.loads
+    _json_body = orjson.dumps
+except ImportError:
+    orjson = None
+    _json_loads = json.loads
+
+    def _json_body(payload):
+        return json.dumps(payload).encode()
+
+# Provider -> API key (or _NO_KEY) resolved from CredentialService / APIKey.
+# Module-level so it survives AIService re-instantiation. APIKey changes clear it
+# on commit; keys written through the credential store (or by another process)
+# are picked up when the TTL expires, so that is the staleness window.
+API_KEY_CACHE_TTL = int(os.getenv('AI_API_KEY_CACHE_TTL', 30))
+_NO_KEY = object()
+_api_key_cache = TTLCache(maxsize=32, ttl=API_KEY_CACHE_TTL)
+_api_key_cache_lock = threading.Lock()
+
+# Providers with a usable key; derived from the same data, so it shares the key
+# cache's invalidation and staleness window
+AVAILABLE_PROVIDERS_CACHE_TTL = int(os.getenv('AI_AVAILABLE_PROVIDERS_CACHE_TTL', API_KEY_CACHE_TTL))
+_available_providers_cache = TTLCache(maxsize=1, ttl=AVAILABLE_PROVIDERS_CACHE_TTL)
+
+
+def clear_api_key_cache():
+    """Forget cached provider API keys and availability (call after credentials change)"""
+    with _api_key_cache_lock:
+        _api_key_cache.clear()
+        _available_providers_cache.clear()
+
+
+# (kind, name) -> to_dict() of the active AIToolModel/AITool row, or _NO_KEY.
+# These tables are admin-edited configuration; change events clear the cache.
+AI_CONFIG_CACHE_TTL = int(os.getenv('AI_CONFIG_CACHE_TTL', 600))
+_config_cache = TTLCache(maxsize=256, ttl=AI_CONFIG_CACHE_TTL)
+_config_cache_lock = threading.Lock()
+
+
+def clear_ai_config_cache():
+    """Forget cached model/tool configuration (call after AIToolModel/AITool changes)"""
+    with _config_cache_lock:
+        _config_cache.clear()
+
+
+# Mapper events fire at flush; the caches named here are cleared only once the
+# session commits, so a concurrent reader can't re-cache pre-commit (or rolled back) rows
+_PENDING_KEY = 'ai_service_cache_invalidations'
+
+
+@event.listens_for(AIToolModel, 'after_insert')
+@event.listens_for(AIToolModel, 'after_update')
+@event.listens_for(AIToolModel, 'after_delete')
+@event.listens_for(AITool, 'after_insert')
+@event.listens_for(AITool, 'after_update')
+@event.listens_for(AITool, 'after_delete')
+def _ai_config_changed(mapper, connection, target):
+    defer_until_commit(target, _PENDING_KEY, 'config')
+
+
+@event.listens_for(APIKey, 'after_insert')
+@event.listens_for(APIKey, 'after_update')
+@event.listens_for(APIKey, 'after_delete')
+def _api_key_changed(mapper, connection, target):
+    defer_until_commit(target, _PENDING_KEY, 'api_keys')
+
+
+def _flush_cache_invalidations(pending):
+    if 'config' in pending:
+        clear_ai_config_cache()
+    if 'api_keys' in pending:
+        clear_api_key_cache()
+
+
+on_commit(_PENDING_KEY, _flush_cache_invalidations)
+
+
+# Keyword arguments OpenAI() accepts, read once: the SDK signature can't change at runtime
+try:
+    _OPENAI_ACCEPTED_PARAMS = frozenset(inspect.signature(OpenAI.__init__).parameters) - {'self'}
+except (TypeError, ValueError):
+    _OPENAI_ACCEPTED_PARAMS = None
+
+
 def create_openai_client(api_key: str, **kwargs) -> OpenAI:
     """
     Safely create an OpenAI client, filtering out unsupported parameters.
@@ -22,25 +122,16 @@ def create_openai_client(api_key: str, **kwargs) -> OpenAI:
     The 'proxies' parameter is not supported in newer versions of the OpenAI SDK.
     This function uses multiple layers of filtering to ensure proxies never gets through.
     """
-    import logging
-    import traceback
-    import inspect
-    logger = logging.getLogger(__name__)
+    # Fast path: nothing to filter when only api_key is given (every internal caller)
+    if not kwargs:
+        return OpenAI(api_key=api_key)
     
     # LAYER 1: Explicit proxies removal (always do this first)
     unsupported_params = {'proxies', '_caller'}
     kwargs = {k: v for k, v in kwargs.items() if k not in unsupported_params}
     
-    # LAYER 2: Get OpenAI's __init__ signature to know which parameters are actually accepted
-    accepted_params = None
-    try:
-        sig = inspect.signature(OpenAI.__init__)
-        accepted_params = set(sig.parameters.keys())
-        # Remove 'self' from accepted params
-        accepted_params.discard('self')
-    except Exception as e:
-        logger.warning(f"Could not inspect OpenAI signature: {e}. Using explicit filtering only.")
-        accepted_params = None
+    # LAYER 2: OpenAI's __init__ parameters (inspected once at import)
+    accepted_params = _OPENAI_ACCEPTED_PARAMS
     
     # LAYER 3: Filter kwargs based on signature (most robust) or explicit filtering
     if accepted_params:
@@ -85,18 +176,113 @@ def create_openai_client(api_key: str, **kwargs) -> OpenAI:
                               f"Original error: {e}, Retry error: {retry_error}") from e
         raise
 
+# Shared HTTP session for the REST providers (Anthropic, Groq, Ollama): keep-alive
+# connections are reused across requests instead of a new TCP/TLS handshake per call.
+# Only connection failures are retried (the request never reached the provider);
+# chat POSTs are not idempotent, so read timeouts and error statuses are never re-sent.
+_http_retry = Retry(
+    total=2,
+    connect=2,
+    read=0,
+    status=0,
+    backoff_factor=0.3
+)
+_http = requests.Session()
+_http.mount('https://', HTTPAdapter(pool_connections=10, pool_maxsize=32, max_retries=_http_retry))
+_http.mount('http://', HTTPAdapter(pool_connections=2, pool_maxsize=8, max_retries=_http_retry))
+
+# OpenAI clients reused per API key so each keeps its HTTP connection pool warm.
+# Keyed by a digest of the key rather than the key itself.
+_openai_clients = LRUCache(maxsize=16)
+_openai_clients_lock = threading.Lock()
+
+
+def get_openai_client(api_key: str) -> OpenAI:
+    """Return the shared OpenAI client for api_key, creating it on first use"""
+    client_key = hashlib.blake2b(api_key.encode(), digest_size=16).digest()
+    with _openai_clients_lock:
+        client = _openai_clients.get(client_key)
+    if client is None:
+        client = create_openai_client(api_key=api_key)
+        with _openai_clients_lock:
+            client = _openai_clients.setdefault(client_key, client)
+    return client
+
+
+def reset_openai_clients():
+    """Drop pooled OpenAI clients (e.g. after credentials change)"""
+    with _openai_clients_lock:
+        _openai_clients.clear()
+
+# Tool name -> tool path, the inverse of TOOL_PATH_TO_NAME (first path wins if a name repeats)
+TOOL_NAME_TO_PATH = {name: path for path, name in reversed(list(TOOL_PATH_TO_NAME.items()))}
+
+# Instruction scaffold for AIService.translate_prompt, parsed once
+_TRANSLATION_TEMPLATE = string.Template("""
+        You are an expert in AI prompt engineering. Translate the following prompt from $source_model format to $target_model format.
+        
+        Original prompt (for $source_model):
+        $prompt
+        
+        Target model: $target_model
+        
+        Provide a JSON response with the following structure:
+        {
+            "translated_prompt": "the translated and optimized prompt for $target_model",
+            "explanation": "brief explanation of changes made and why",
+            "tips": ["tip 1", "tip 2", "tip 3"] (3 tips for using this prompt with $target_model)
+        }
+        
+        Consider the strengths and characteristics of $target_model when translating.
+        """)
+
 class AIService:
     """Unified service for AI operations across multiple providers"""
     
+    # Model name prefix -> provider, checked in order by _detect_provider
+    _PROVIDER_PREFIXES = (
+        ('gpt-', 'openai'),
+        ('dall-e', 'openai'),
+        ('claude', 'anthropic'),
+        ('llama', 'groq'),
+        ('mixtral', 'groq'),
+        ('gemma', 'groq'),
+        ('ollama/', 'ollama'),
+    )
+    
+    # OpenAI model prefixes that accept response_format={'type': 'json_object'};
+    # every Groq chat model does
+    _JSON_MODE_OPENAI_PREFIXES = ('gpt-4o', 'gpt-4-turbo', 'gpt-4.1', 'gpt-3.5-turbo')
+    
     def __init__(self):
         # Only store non-credential config from environment
         self.ollama_base_url = os.getenv('OLLAMA_BASE_URL', 'http://127.0.0.1:11434')
         
+        # Provider -> chat implementation used by chat_completion
+        self._chat_dispatch = {
+            'openai': self._openai_chat,
+            'anthropic': self._anthropic_chat,
+            'groq': self._groq_chat,
+            'ollama': self._ollama_chat,
+        }
+        
         # Note: API keys are now loaded from database via CredentialService
         # OpenAI client is created on-demand in _openai_chat() to ensure
         # we always fetch the latest key from database first (consistent with other providers)
     
     def get_api_key_for_provider(self, provider: str) -> Optional[str]:
+        """Get API key for a provider, cached for API_KEY_CACHE_TTL seconds"""
+        with _api_key_cache_lock:
+            cached = _api_key_cache.get(provider)
+        if cached is not None:
+            return None if cached is _NO_KEY else cached
+        
+        api_key = self._lookup_api_key(provider)
+        with _api_key_cache_lock:
+            _api_key_cache[provider] = _NO_KEY if api_key is None else api_key
+        return api_key
+    
+    def _lookup_api_key(self, provider: str) -> Optional[str]:
         """Get API key for a provider from database via CredentialService"""
         try:
             # First try CredentialService (ExternalCredential model)
@@ -126,7 +312,19 @@ class AIService:
         return None
     
     def get_available_providers(self) -> List[str]:
-        """Get list of providers that have active and valid API keys"""
+        """Get list of providers that have active and valid API keys (cached)"""
+        with _api_key_cache_lock:
+            cached = _available_providers_cache.get('providers')
+        if cached is not None:
+            return list(cached)
+        
+        available = self._lookup_available_providers()
+        with _api_key_cache_lock:
+            _available_providers_cache['providers'] = tuple(available)
+        return available
+    
+    def _lookup_available_providers(self) -> List[str]:
+        """Collect providers from active APIKey rows plus the credential store"""
         available = []
         try:
             # Get from database
@@ -139,13 +337,10 @@ class AIService:
                 if key.provider and key.provider not in available:
                     available.append(key.provider)
             
-            # Also check environment variables
-            if self.openai_api_key and 'openai' not in available:
-                available.append('openai')
-            if self.anthropic_api_key and 'anthropic' not in available:
-                available.append('anthropic')
-            if self.groq_api_key and 'groq' not in available:
-                available.append('groq')
+            # Also check keys held by CredentialService (database/environment)
+            for provider in ('openai', 'anthropic', 'groq'):
+                if provider not in available and self.get_api_key_for_provider(provider):
+                    available.append(provider)
             # Ollama doesn't need API keys
             if 'ollama' not in available:
                 available.append('ollama')
@@ -157,14 +352,29 @@ class AIService:
     
     def has_api_key_for_provider(self, provider: str) -> bool:
         """Check if an API key is available for a provider"""
-        return self.get_api_key_for_provider(provider) is not None or provider == 'ollama'
+        if provider == 'ollama':
+            # Local models need no key - skip the credential lookup entirely
+            return True
+        return self.get_api_key_for_provider(provider) is not None
+    
+    def _get_cached_config(self, model_class, name: str) -> Optional[Dict]:
+        """Return to_dict() of the active model_class row called name, cached for AI_CONFIG_CACHE_TTL"""
+        cache_key = (model_class.__name__, name)
+        with _config_cache_lock:
+            cached = _config_cache.get(cache_key)
+        if cached is not None:
+            return None if cached is _NO_KEY else dict(cached)
+        
+        row = model_class.query.filter_by(name=name, is_active=True).first()
+        config = row.to_dict() if row else None
+        with _config_cache_lock:
+            _config_cache[cache_key] = _NO_KEY if config is None else config
+        return dict(config) if config else None
     
     def get_model_config(self, model_name: str) -> Optional[Dict]:
         """Get model configuration from database"""
         try:
-            model = AIToolModel.query.filter_by(name=model_name, is_active=True).first()
-            if model:
-                return model.to_dict()
+            return self._get_cached_config(AIToolModel, model_name)
         except Exception as e:
             current_app.logger.error(f"Error getting model config: {e}")
         
@@ -173,36 +383,19 @@ class AIService:
     def get_tool_config(self, tool_name: str) -> Optional[Dict]:
         """Get tool configuration from database"""
         try:
-            tool = AITool.query.filter_by(name=tool_name, is_active=True).first()
-            if tool:
-                return tool.to_dict()
+            return self._get_cached_config(AITool, tool_name)
         except Exception as e:
             current_app.logger.error(f"Error getting tool config: {e}")
         
         return None
     
-    def _detect_provider(self, model: str) -> str:
-        """Detect provider from model name"""
-        model_lower = model.lower()
-        
-        if 'gpt' in model_lower or 'davinci' in model_lower or 'curie' in model_lower:
-            return 'openai'
-        elif 'claude' in model_lower:
-            return 'anthropic'
-        elif 'llama' in model_lower or 'mixtral' in model_lower or 'gemma' in model_lower:
-            return 'groq'
-        elif 'ollama' in model_lower:
-            return 'ollama'
-        else:
-            # Default to OpenAI for unknown models
-            return 'openai'
-    
     def chat_completion(
         self,
         messages: List[Dict[str, str]],
         model: str = 'gpt-4',
         temperature: float = 0.7,
         max_tokens: int = 1000,
+        response_format: Optional[Dict[str, str]] = None,
         **kwargs
     ) -> Dict[str, Any]:
         """
@@ -213,6 +406,7 @@ class AIService:
             model: Model identifier
             temperature: Sampling temperature
             max_tokens: Maximum tokens to generate
+            response_format: e.g. {'type': 'json_object'}; only sent to models that support it
             
         Returns:
             Dict with 'text', 'usage', 'model', 'provider'
@@ -227,102 +421,129 @@ class AIService:
             current_app.logger.warning(error_msg)
             raise ValueError(error_msg)
         
+        handler = self._chat_dispatch.get(provider)
+        if handler is None:
+            raise ValueError(f"Unsupported provider: {provider}")
+        
+        handler_kwargs = {}
+        if response_format and self._supports_json_mode(provider, model):
+            handler_kwargs['response_format'] = response_format
+        
         try:
-            if provider == 'openai':
-                return self._openai_chat(messages, model, temperature, max_tokens)
-            elif provider == 'anthropic':
-                return self._anthropic_chat(messages, model, temperature, max_tokens)
-            elif provider == 'groq':
-                return self._groq_chat(messages, model, temperature, max_tokens)
-            elif provider == 'ollama':
-                return self._ollama_chat(messages, model, temperature, max_tokens)
-            else:
-                raise ValueError(f"Unsupported provider: {provider}")
-                
-        except Exception as e:
-            # Log detailed error with context
-            error_detail = str(e)
-            current_app.logger.error(
-                f"Chat completion error - Provider: {provider}, Model: {model}, Error: {error_detail}",
-                exc_info=True
+            return handler(messages, model, temperature, max_tokens, **handler_kwargs)
+        except ValueError:
+            # Provider methods already log and sanitize their expected failures
+            raise
+        except TypeError as e:
+            # The OpenAI SDK raises TypeError when an httpx/SDK version mismatch injects 'proxies'
+            if 'proxies' not in str(e):
+                raise self._unexpected_chat_error(provider, model, e) from e
+            return self._chat_completion_retry_on_proxies_error(
+                e, provider, messages, model, temperature, max_tokens, **handler_kwargs
             )
+        except Exception as e:
+            raise self._unexpected_chat_error(provider, model, e) from e
+    
+    def _unexpected_chat_error(self, provider: str, model: str, error: Exception) -> ValueError:
+        """Log an unexpected provider failure in full and build the sanitized error for callers"""
+        error_detail = str(error)
+        current_app.logger.error(
+            f"Chat completion error - Provider: {provider}, Model: {model}, Error: {error_detail}",
+            exc_info=error
+        )
+        # Raise with context instead of returning fallback so endpoints can handle errors properly
+        sanitized_msg = sanitize_error_message(
+            f"AI service error for {provider}/{model}: {error_detail}",
+            expose_details=False
+        )
+        return ValueError(sanitized_msg)
+    
+    def _supports_json_mode(self, provider: str, model: str) -> bool:
+        """Whether provider/model honours response_format={'type': 'json_object'}"""
+        if provider == 'groq':
+            return True
+        return provider == 'openai' and model.startswith(self._JSON_MODE_OPENAI_PREFIXES)
+    
+    def _chat_completion_retry_on_proxies_error(
+        self,
+        error: TypeError,
+        provider: str,
+        messages: List[Dict[str, str]],
+        model: str,
+        temperature: float,
+        max_tokens: int,
+        response_format: Optional[Dict[str, str]] = None
+    ) -> Dict[str, Any]:
+        """Retry an OpenAI chat completion with a fresh client after a 'proxies' TypeError"""
+        current_app.logger.error(
+            f"PROXIES ERROR DETECTED in chat_completion - Provider: {provider}, Model: {model}, Error: {error}. "
+            "Attempting to work around by creating fresh client without any kwargs."
+        )
+        if provider != 'openai':
+            raise error
+        
+        # Retry with a completely fresh approach - create new client with only api_key
+        # This bypasses any cached code that might be passing proxies
+        try:
+            current_app.logger.info("Retrying chat completion with fresh OpenAI client (no kwargs)")
+            api_key = self.get_api_key_for_provider(provider)
+            if not api_key:
+                raise ValueError(f"API key not available for {provider}")
             
-            # Check if it's a proxies error specifically
-            if 'proxies' in error_detail.lower():
-                current_app.logger.error(
-                    "PROXIES ERROR DETECTED in chat_completion! "
-                    "Attempting to work around by creating fresh client without any kwargs."
-                )
-                
-                # Retry with a completely fresh approach - create new client with only api_key
-                # This bypasses any cached code that might be passing proxies
-                try:
-                    current_app.logger.info("Retrying chat completion with fresh OpenAI client (no kwargs)")
-                    api_key = self.get_api_key_for_provider(provider)
-                    if not api_key:
-                        raise ValueError(f"API key not available for {provider}")
-                    
-                    # Create client with ONLY api_key - no kwargs at all
-                    fresh_client = create_openai_client(api_key=api_key)
-                    
-                    # Use the fresh client directly
-                    if provider == 'openai':
-                        response = fresh_client.chat.completions.create(
-                            model=model,
-                            messages=messages,
-                            temperature=temperature,
-                            max_tokens=max_tokens
-                        )
-                        return {
-                            'text': response.choices[0].message.content,
-                            'usage': {
-                                'prompt_tokens': response.usage.prompt_tokens,
-                                'completion_tokens': response.usage.completion_tokens,
-                                'total_tokens': response.usage.total_tokens
-                            },
-                            'model': model,
-                            'provider': 'openai',
-                            'finish_reason': response.choices[0].finish_reason
-                        }
-                except Exception as retry_error:
-                    current_app.logger.error(f"Retry after proxies error also failed: {retry_error}")
-                    raise ValueError(
-                        f"AI service initialization error (proxies parameter). "
-                        f"Provider: {provider}, Model: {model}. "
-                        f"Even after retry with fresh client, error persists. "
-                        f"Original error: {error_detail}, Retry error: {retry_error}"
-                    )
-            
-            # For other errors, raise with context instead of returning fallback
-            # This allows endpoints to handle errors properly
-            from app.utils.security import sanitize_error_message
-            sanitized_msg = sanitize_error_message(
-                f"AI service error for {provider}/{model}: {error_detail}",
-                expose_details=False
+            # Create client with ONLY api_key - no kwargs at all
+            fresh_client = create_openai_client(api_key=api_key)
+            request_kwargs = {'response_format': response_format} if response_format else {}
+            response = fresh_client.chat.completions.create(
+                model=model,
+                messages=messages,
+                temperature=temperature,
+                max_tokens=max_tokens,
+                **request_kwargs
+            )
+            return {
+                'text': response.choices[0].message.content,
+                'usage': {
+                    'prompt_tokens': response.usage.prompt_tokens,
+                    'completion_tokens': response.usage.completion_tokens,
+                    'total_tokens': response.usage.total_tokens
+                },
+                'model': model,
+                'provider': 'openai',
+                'finish_reason': response.choices[0].finish_reason
+            }
+        except Exception as retry_error:
+            current_app.logger.error(f"Retry after proxies error also failed: {retry_error}")
+            raise ValueError(
+                f"AI service initialization error (proxies parameter). "
+                f"Provider: {provider}, Model: {model}. "
+                f"Even after retry with fresh client, error persists. "
+                f"Original error: {error}, Retry error: {retry_error}"
             )
-            raise ValueError(sanitized_msg)
     
     def _openai_chat(
         self,
         messages: List[Dict],
         model: str,
         temperature: float,
-        max_tokens: int
+        max_tokens: int,
+        response_format: Optional[Dict[str, str]] = None
     ) -> Dict:
         """OpenAI chat completion"""
         api_key = self.get_api_key_for_provider('openai')
         if not api_key:
             raise ValueError("OpenAI API key not configured")
         
-        # Create client with the API key
-        client = create_openai_client(api_key=api_key)
+        # Shared client for this API key (keeps connections alive between requests)
+        client = get_openai_client(api_key)
+        request_kwargs = {'response_format': response_format} if response_format else {}
         
         try:
             response = client.chat.completions.create(
                 model=model,
                 messages=messages,
                 temperature=temperature,
-                max_tokens=max_tokens
+                max_tokens=max_tokens,
+                **request_kwargs
             )
             
             return {
@@ -336,19 +557,11 @@ class AIService:
                 'provider': 'openai',
                 'finish_reason': response.choices[0].finish_reason
             }
-        except Exception as e:
+        except APIError as e:
             # P2 Fix: Log detailed error but return sanitized message
+            # (APIError covers connection, timeout, rate-limit and status errors from the SDK)
             error_detail = str(e)
-            current_app.logger.error(f"OpenAI API error: {error_detail}", exc_info=True)
-            
-            # Check if it's a proxies error and provide helpful message
-            if 'proxies' in error_detail.lower():
-                current_app.logger.error("PROXIES ERROR DETECTED in _openai_chat! This should not happen with create_openai_client()")
-                current_app.logger.error(f"Error details: {error_detail}")
-                current_app.logger.error("This indicates the server needs to be restarted or code needs update")
-                raise ValueError("AI service error: __init__() got an unexpected keyword argument 'proxies'")
-            
-            from app.utils.security import sanitize_error_message
+            current_app.logger.error(f"OpenAI API error: {error_detail}")
             sanitized_msg = sanitize_error_message(f"AI service error: {error_detail}", expose_details=False)
             raise ValueError(sanitized_msg)
     
@@ -386,16 +599,19 @@ class AIService:
             payload['system'] = system_message
         
         try:
-            response = requests.post(url, headers=headers, json=payload, timeout=60)
+            response = _http.post(url, headers=headers, data=_json_body(payload), timeout=60)
             response.raise_for_status()
-            data = response.json()
+            data = _json_loads(response.content)
             
+            usage = data.get('usage', {})
+            prompt_tokens = usage.get('input_tokens', 0)
+            completion_tokens = usage.get('output_tokens', 0)
             return {
                 'text': data['content'][0]['text'],
                 'usage': {
-                    'prompt_tokens': data['usage'].get('input_tokens', 0),
-                    'completion_tokens': data['usage'].get('output_tokens', 0),
-                    'total_tokens': data['usage'].get('input_tokens', 0) + data['usage'].get('output_tokens', 0)
+                    'prompt_tokens': prompt_tokens,
+                    'completion_tokens': completion_tokens,
+                    'total_tokens': prompt_tokens + completion_tokens
                 },
                 'model': model,
                 'provider': 'anthropic',
@@ -404,26 +620,20 @@ class AIService:
         except requests.exceptions.RequestException as e:
             # P2 Fix: Log detailed error but return sanitized message
             error_detail = str(e)
-            current_app.logger.error(f"Anthropic API request error: {error_detail}", exc_info=True)
-            from app.utils.security import sanitize_error_message
+            current_app.logger.error(f"Anthropic API request error: {error_detail}")
             sanitized_msg = sanitize_error_message(f"Anthropic API request failed: {error_detail}", expose_details=False)
             raise ValueError(sanitized_msg)
-        except KeyError as e:
-            current_app.logger.error(f"Anthropic API response format error: {e}", exc_info=True)
+        except (KeyError, IndexError, ValueError) as e:
+            current_app.logger.error(f"Anthropic API response format error: {e}")
             raise ValueError("Anthropic API response format error")
-        except Exception as e:
-            error_detail = str(e)
-            current_app.logger.error(f"Anthropic API error: {error_detail}", exc_info=True)
-            from app.utils.security import sanitize_error_message
-            sanitized_msg = sanitize_error_message(f"Anthropic API error: {error_detail}", expose_details=False)
-            raise ValueError(sanitized_msg)
     
     def _groq_chat(
         self,
         messages: List[Dict],
         model: str,
         temperature: float,
-        max_tokens: int
+        max_tokens: int,
+        response_format: Optional[Dict[str, str]] = None
     ) -> Dict:
         """Groq chat completion"""
         api_key = self.get_api_key_for_provider('groq')
@@ -442,11 +652,13 @@ class AIService:
             'temperature': temperature,
             'max_tokens': max_tokens
         }
+        if response_format:
+            payload['response_format'] = response_format
         
         try:
-            response = requests.post(url, headers=headers, json=payload, timeout=60)
+            response = _http.post(url, headers=headers, data=_json_body(payload), timeout=60)
             response.raise_for_status()
-            data = response.json()
+            data = _json_loads(response.content)
             
             usage = data.get('usage', {})
             return {
@@ -463,19 +675,12 @@ class AIService:
         except requests.exceptions.RequestException as e:
             # P2 Fix: Log detailed error but return sanitized message
             error_detail = str(e)
-            current_app.logger.error(f"Groq API request error: {error_detail}", exc_info=True)
-            from app.utils.security import sanitize_error_message
+            current_app.logger.error(f"Groq API request error: {error_detail}")
             sanitized_msg = sanitize_error_message(f"Groq API request failed: {error_detail}", expose_details=False)
             raise ValueError(sanitized_msg)
-        except (KeyError, IndexError) as e:
-            current_app.logger.error(f"Groq API response format error: {e}", exc_info=True)
+        except (KeyError, IndexError, ValueError) as e:
+            current_app.logger.error(f"Groq API response format error: {e}")
             raise ValueError("Groq API response format error")
-        except Exception as e:
-            error_detail = str(e)
-            current_app.logger.error(f"Groq API error: {error_detail}", exc_info=True)
-            from app.utils.security import sanitize_error_message
-            sanitized_msg = sanitize_error_message(f"Groq API error: {error_detail}", expose_details=False)
-            raise ValueError(sanitized_msg)
     
     def _ollama_chat(
         self,
@@ -492,24 +697,59 @@ class AIService:
         payload = {
             'model': local_model,
             'messages': messages,
+            'stream': True,
             'options': {
                 'temperature': temperature,
                 'num_predict': max_tokens
             }
         }
         
-        response = requests.post(url, json=payload, timeout=120)
-        response.raise_for_status()
-        data = response.json()
+        # Streamed NDJSON: consume chunks as they are generated instead of
+        # waiting for (and buffering) one large response body
+        parts = []
+        final_chunk = {}
+        stream_error = None
+        headers = {'Content-Type': 'application/json'}
+        try:
+            with _http.post(url, headers=headers, data=_json_body(payload), stream=True, timeout=120) as response:
+                response.raise_for_status()
+                for line in response.iter_lines():
+                    if not line:
+                        continue
+                    chunk = _json_loads(line)
+                    # Ollama reports mid-generation failures as an {"error": ...} chunk
+                    if chunk.get('error'):
+                        stream_error = chunk['error']
+                        break
+                    parts.append(chunk.get('message', {}).get('content', '') or chunk.get('response', ''))
+                    if chunk.get('done'):
+                        final_chunk = chunk
+                        break
+        except requests.exceptions.RequestException as e:
+            # P2 Fix: Log detailed error but return sanitized message
+            error_detail = str(e)
+            current_app.logger.error(f"Ollama API request error: {error_detail}")
+            sanitized_msg = sanitize_error_message(f"Ollama API request failed: {error_detail}", expose_details=False)
+            raise ValueError(sanitized_msg)
+        except ValueError as e:
+            current_app.logger.error(f"Ollama API response format error: {e}")
+            raise ValueError("Ollama API response format error")
+        
+        if stream_error:
+            current_app.logger.error(f"Ollama generation error: {stream_error}")
+            sanitized_msg = sanitize_error_message(f"Ollama generation failed: {stream_error}", expose_details=False)
+            raise ValueError(sanitized_msg)
         
-        text = data.get('message', {}).get('content', '') or data.get('response', '')
+        text = ''.join(parts)
+        prompt_tokens = final_chunk.get('prompt_eval_count', 0)
+        completion_tokens = final_chunk.get('eval_count', 0)
         
         return {
             'text': text,
             'usage': {
-                'prompt_tokens': 0,
-                'completion_tokens': 0,
-                'total_tokens': 0
+                'prompt_tokens': prompt_tokens,
+                'completion_tokens': completion_tokens,
+                'total_tokens': prompt_tokens + completion_tokens
             },
             'model': model,
             'provider': 'ollama',
@@ -517,17 +757,11 @@ class AIService:
         }
     
     def _detect_provider(self, model: str) -> str:
-        """Detect provider from model name"""
-        if model.startswith('gpt-') or model.startswith('dall-e'):
-            return 'openai'
-        elif model.startswith('claude'):
-            return 'anthropic'
-        elif model.startswith('llama') or model.startswith('mixtral'):
-            return 'groq'
-        elif model.startswith('ollama/'):
-            return 'ollama'
-        else:
-            return 'openai'  # Default to OpenAI
+        """Detect provider from model name prefix"""
+        for prefix, provider in self._PROVIDER_PREFIXES:
+            if model.startswith(prefix):
+                return provider
+        return 'openai'  # Default to OpenAI
     
     def generate_image(
         self,
@@ -555,7 +789,7 @@ class AIService:
             raise ValueError("OpenAI API key not configured")
         
         # Use new OpenAI SDK
-        client = create_openai_client(api_key=api_key)
+        client = get_openai_client(api_key)
         
         try:
             # Build parameters for image generation
@@ -591,7 +825,6 @@ class AIService:
                 current_app.logger.error("PROXIES ERROR DETECTED in generate_image! This should not happen with create_openai_client()")
                 raise ValueError("Image generation failed: Proxies parameter error (this indicates code needs update or server restart)")
             
-            from app.utils.security import sanitize_error_message
             sanitized_msg = sanitize_error_message(f"Image generation failed: {error_detail}", expose_details=False)
             raise ValueError(sanitized_msg)
     
@@ -621,11 +854,7 @@ class AIService:
             model_to_use, _ = resolve_tool_model(tool_path)
         else:
             # Find tool path from tool name
-            tool_path = None
-            for path, name in TOOL_PATH_TO_NAME.items():
-                if name == tool_name:
-                    tool_path = path
-                    break
+            tool_path = TOOL_NAME_TO_PATH.get(tool_name)
             
             if tool_path:
                 model_to_use, _ = resolve_tool_model(tool_path, tool_name)
@@ -634,23 +863,11 @@ class AIService:
                 tool_config = self.get_tool_config(tool_name)
                 model_to_use = tool_config.get('default_model', 'gpt-4') if tool_config else 'gpt-4'
         
-        translation_prompt = f"""
-        You are an expert in AI prompt engineering. Translate the following prompt from {source_model} format to {target_model} format.
-        
-        Original prompt (for {source_model}):
-        {prompt}
-        
-        Target model: {target_model}
-        
-        Provide a JSON response with the following structure:
-        {{
-            "translated_prompt": "the translated and optimized prompt for {target_model}",
-            "explanation": "brief explanation of changes made and why",
-            "tips": ["tip 1", "tip 2", "tip 3"] (3 tips for using this prompt with {target_model})
-        }}
-        
-        Consider the strengths and characteristics of {target_model} when translating.
-        """
+        translation_prompt = _TRANSLATION_TEMPLATE.substitute(
+            source_model=source_model,
+            target_model=target_model,
+            prompt=prompt
+        )
         
         messages = [{"role": "user", "content": translation_prompt}]
         
@@ -659,14 +876,16 @@ class AIService:
                 messages=messages,
                 model=model_to_use,
                 temperature=0.7,
-                max_tokens=1000
+                max_tokens=1000,
+                response_format={'type': 'json_object'}
             )
             
-            # Parse JSON response
+            # Parse JSON response (guaranteed for JSON-mode models)
             try:
-                translated_data = json.loads(result['text'])
-            except:
+                translated_data = _json_loads(result['text'])
+            except (ValueError, TypeError) as e:
                 # Fallback if JSON parsing fails
+                current_app.logger.warning(f"Prompt translation returned non-JSON output from {result['model']}: {e}")
                 translated_data = {
                     'translated_prompt': f"Optimized for {target_model}: {prompt}",
                     'explanation': result['text'][:200],
@@ -714,11 +933,7 @@ class AIService:
             model_to_use, _ = resolve_tool_model(tool_path)
         else:
             # Find tool path from tool name
-            tool_path = None
-            for path, name in TOOL_PATH_TO_NAME.items():
-                if name == tool_name:
-                    tool_path = path
-                    break
+            tool_path = TOOL_NAME_TO_PATH.get(tool_name)
             
             if tool_path:
                 model_to_use, _ = resolve_tool_model(tool_path, tool_name)
@@ -788,11 +1003,7 @@ class AIService:
             model_to_use, _ = resolve_tool_model(tool_path)
         else:
             # Find tool path from tool name
-            tool_path = None
-            for path, name in TOOL_PATH_TO_NAME.items():
-                if name == tool_name:
-                    tool_path = path
-                    break
+            tool_path = TOOL_NAME_TO_PATH.get(tool_name)
             
             if tool_path:
                 model_to_use, _ = resolve_tool_model(tool_path, tool_name)
@@ -831,7 +1042,7 @@ class AIService:
             
             # Parse JSON response
             try:
-                code_data = json.loads(result['text'])
+                code_data = _json_loads(result['text'])
             except:
                 # Fallback if JSON parsing fails
                 code_data = {
@@ -874,11 +1085,7 @@ class AIService:
             model_to_use, _ = resolve_tool_model(tool_path)
         else:
             # Find tool path from tool name
-            tool_path = None
-            for path, name in TOOL_PATH_TO_NAME.items():
-                if name == tool_name:
-                    tool_path = path
-                    break
+            tool_path = TOOL_NAME_TO_PATH.get(tool_name)
             
             if tool_path:
                 model_to_use, _ = resolve_tool_model(tool_path, tool_name)
@@ -921,7 +1128,7 @@ class AIService:
             
             # Parse JSON response
             try:
-                grade_data = json.loads(result['text'])
+                grade_data = _json_loads(result['text'])
             except:
                 # Fallback if JSON parsing fails
                 grade_data = {
@@ -970,7 +1177,10 @@ def get_ai_service(force_reload: bool = False) -> AIService:
         return _ai_service
 
 def reset_ai_service():
-    """Reset the AI service singleton (useful for testing or after code changes)"""
+    """Reset the AI service singleton and its caches (useful for testing or after code/credential changes)"""
     global _ai_service
     _ai_service = None
+    clear_api_key_cache()
+    clear_ai_config_cache()
+    reset_openai_clients()
 
@@ -0,0 +1,109 @@
+"""
+Leaderboard snapshot refresh
+Rebuilds the leaderboard_entries table from users + user_progress on a fixed interval
+"""
+
+import os
+import threading
+import time
+import logging
+from sqlalchemy import inspect, text
+
+logger = logging.getLogger(__name__)
+
+# Seconds between snapshot rebuilds
+LEADERBOARD_REFRESH_INTERVAL = int(os.getenv('LEADERBOARD_REFRESH_INTERVAL', 300))
+# Seconds before trying again when the snapshot table is missing or a rebuild failed
+LEADERBOARD_RETRY_INTERVAL = int(os.getenv('LEADERBOARD_RETRY_INTERVAL', 15))
+
+_leaderboard_thread = None
+
+# MySQL named lock: every app process runs this worker, only the holder rebuilds
+_ACQUIRE_LOCK_SQL = text("SELECT GET_LOCK('leaderboard_refresh', 0)")
+_RELEASE_LOCK_SQL = text("SELECT RELEASE_LOCK('leaderboard_refresh')")
+
+_DELETE_SNAPSHOT_SQL = text("DELETE FROM leaderboard_entries")
+
+_INSERT_SNAPSHOT_SQL = text("""
+    INSERT INTO leaderboard_entries
+        (user_id, username, avatar_url, total_xp, level, learning_streak, overall_progress, refreshed_at)
+    SELECT u.id, u.username, u.avatar_url, COALESCE(u.total_xp, 0), COALESCE(u.level, 1),
+           COALESCE(p.learning_streak, 0), COALESCE(p.overall_progress, 0), UTC_TIMESTAMP()
+    FROM users u
+    LEFT JOIN user_progress p ON p.user_id = u.id
+    WHERE u.is_active = 1
+""")
+
+
+def refresh_leaderboard():
+    """
+    Rebuild the leaderboard snapshot in a single transaction.
+
+    Readers keep seeing the previous snapshot until the commit (InnoDB MVCC),
+    so the swap is atomic from the API's point of view. The rebuild runs under
+    a non-blocking GET_LOCK so concurrent processes never rebuild at once.
+
+    Returns:
+        Number of rows in the new snapshot, or None if another process holds the lock
+    """
+    from app import db
+
+    # One dedicated connection: MySQL named locks belong to the session that took them
+    with db.engine.connect() as conn:
+        if not conn.execute(_ACQUIRE_LOCK_SQL).scalar():
+            conn.rollback()
+            return None
+        try:
+            conn.execute(_DELETE_SNAPSHOT_SQL)
+            result = conn.execute(_INSERT_SNAPSHOT_SQL)
+            conn.commit()
+            return result.rowcount
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            conn.execute(_RELEASE_LOCK_SQL)
+            conn.commit()
+
+
+def start_leaderboard_refresh_worker(app):
+    """
+    Start the background thread that periodically rebuilds the leaderboard snapshot.
+
+    Called from the serving entry points (wsgi.py, startup.py) only, not from
+    create_app, so scripts and migrations don't start refreshers.
+    """
+    global _leaderboard_thread
+
+    if _leaderboard_thread is None or not _leaderboard_thread.is_alive():
+        _leaderboard_thread = threading.Thread(
+            target=_refresh_leaderboard_loop, args=(app,), daemon=True
+        )
+        _leaderboard_thread.start()
+        logger.info("Leaderboard refresh worker thread started")
+
+
+def _refresh_leaderboard_loop(app):
+    """Background worker: rebuild the snapshot, then sleep for the refresh interval"""
+    from app import db
+
+    table_ready = False
+    while True:
+        delay = LEADERBOARD_REFRESH_INTERVAL
+        with app.app_context():
+            try:
+                if not table_ready:
+                    table_ready = inspect(db.engine).has_table('leaderboard_entries')
+                if not table_ready:
+                    logger.info(f"Leaderboard snapshot table not created yet, retrying in {LEADERBOARD_RETRY_INTERVAL}s")
+                    delay = LEADERBOARD_RETRY_INTERVAL
+                else:
+                    rows = refresh_leaderboard()
+                    if rows is None:
+                        logger.debug("Leaderboard refresh skipped - another process holds the lock")
+                    else:
+                        logger.debug(f"Leaderboard snapshot refreshed ({rows} rows)")
+            except Exception as e:
+                logger.error(f"Failed to refresh leaderboard snapshot: {e}", exc_info=True)
+                delay = LEADERBOARD_RETRY_INTERVAL
+        time.sleep(delay)
@@ -0,0 +1,82 @@
+"""
+Cached user profile serialization
+Read-through cache (the shared Redis cache from app.extensions) for User.to_dict(),
+invalidated whenever a User row changes
+"""
+
+import os
+import logging
+from sqlalchemy import event
+from app.models.user import User
+from app.extensions import cache, _use_redis
+from app.utils.commit_hooks import defer_until_commit, on_commit
+
+logger = logging.getLogger(__name__)
+
+# Profiles change rarely; invalidation on update keeps them correct, the TTL bounds memory
+PROFILE_CACHE_TTL = int(os.getenv('PROFILE_CACHE_TTL', 300))
+
+_PENDING_KEY = 'user_profile_cache_invalidations'
+
+# Only cache when the shared cache is Redis: the in-memory fallback is per process,
+# so an invalidation in one worker would leave stale profiles in the others
+_cache_enabled = _use_redis
+
+
+def _profile_key(user_id):
+    return f"user:{user_id}:profile"
+
+
+def get_user_profile_dict(user_id):
+    """
+    Return User.to_dict() for user_id, served from Redis when cached.
+
+    Returns:
+        The profile dictionary, or None if the user does not exist
+    """
+    if _cache_enabled:
+        try:
+            cached = cache.get(_profile_key(user_id))
+            if cached is not None:
+                return cached
+        except Exception as e:
+            logger.warning(f"User profile cache read failed for user {user_id}: {e}")
+
+    user = User.query.get(user_id)
+    if user is None:
+        return None
+
+    profile = user.to_dict()
+    if _cache_enabled:
+        try:
+            cache.set(_profile_key(user_id), profile, timeout=PROFILE_CACHE_TTL)
+        except Exception as e:
+            logger.warning(f"User profile cache write failed for user {user_id}: {e}")
+    return profile
+
+
+def invalidate_user_profile(user_id):
+    """Drop the cached profile for user_id (call after Core UPDATEs that bypass the ORM)"""
+    if not _cache_enabled:
+        return
+    try:
+        cache.delete(_profile_key(user_id))
+    except Exception as e:
+        logger.warning(f"User profile cache invalidation failed for user {user_id}: {e}")
+
+
+# ORM changes are collected at flush and invalidated only once the transaction
+# commits, so a concurrent reader can't re-cache pre-commit data
+
+@event.listens_for(User, 'after_update')
+@event.listens_for(User, 'after_delete')
+def _queue_profile_invalidation(mapper, connection, target):
+    defer_until_commit(target, _PENDING_KEY, target.id)
+
+
+def _flush_profile_invalidations(user_ids):
+    for user_id in user_ids:
+        invalidate_user_profile(user_id)
+
+
+on_commit(_PENDING_KEY, _flush_profile_invalidations)
@@ -0,0 +1,47 @@
+"""
+Non-blocking logging helpers
+Moves handler I/O (formatting, stream/file writes) off the request thread
+"""
+
+import atexit
+import logging
+import queue
+from logging.handlers import QueueHandler, QueueListener
+
+
+def enable_queue_logging(target_logger):
+    """
+    Route a logger's records through a background QueueListener.
+
+    The request thread only enqueues the LogRecord; formatting and writing
+    happen on the listener thread using the handlers the logger would
+    otherwise have used (its own, or the root logger's when it propagates).
+
+    Args:
+        target_logger: Logger to make non-blocking
+
+    Returns:
+        The started QueueListener, or None if there were no handlers to wrap
+    """
+    existing = getattr(target_logger, '_queue_listener', None)
+    if existing is not None:
+        return existing
+
+    handlers = list(target_logger.handlers) or list(logging.getLogger().handlers)
+    if not handlers:
+        # Nothing configured yet - leave the logger alone so lastResort still works
+        return None
+
+    log_queue = queue.Queue(-1)
+    listener = QueueListener(log_queue, *handlers, respect_handler_level=True)
+
+    for handler in list(target_logger.handlers):
+        target_logger.removeHandler(handler)
+    target_logger.addHandler(QueueHandler(log_queue))
+    # Records now reach the original handlers through the listener only
+    target_logger.propagate = False
+
+    listener.start()
+    atexit.register(listener.stop)
+    target_logger._queue_listener = listener
+    return listener
@@ -6,8 +6,10 @@ Provides consistent auth handling across all API endpoints
 from functools import wraps
 from flask import request, g
 from flask_jwt_extended import jwt_required, get_jwt_identity, verify_jwt_in_request
-from app.models.user import User
+from app import db
+from app.models.user import User, UserActivityLog
 from app.utils.responses import APIResponse, ErrorCodes
+from app.services.activity_log_service import enqueue_activity
 import logging
 
 logger = logging.getLogger(__name__)
@@ -241,13 +243,15 @@ def rate_limit(requests_per_minute=60):
         return limited_func
     return decorator
 
-def log_user_activity(action, description=None):
+def log_user_activity(action, description=None, sync=False):
     """
     Log user activity for audit purposes
     
     Args:
         action: Action being performed
         description: Optional description
+        sync: Write the row in its own commit before returning instead of
+            queueing it for the batch writer (use for security-relevant actions)
     """
     def decorator(f):
         @wraps(f)
@@ -258,10 +262,7 @@ def log_user_activity(action, description=None):
             # Log activity after successful execution
             if hasattr(g, 'current_user') and g.current_user:
                 try:
-                    from app.models.user import UserActivityLog
-                    from app import db
-                    
-                    activity = UserActivityLog(
+                    activity = dict(
                         user_id=g.current_user.id,
                         action=action,
                         description=description or f"Performed {action}",
@@ -273,11 +274,16 @@ def log_user_activity(action, description=None):
                             'url': request.url
                         }
                     )
-                    
-                    db.session.add(activity)
-                    db.session.commit()
+                    if sync:
+                        db.session.add(UserActivityLog(**activity))
+                        db.session.commit()
+                    else:
+                        # Rows are bulk-inserted by a background worker instead of a per-request commit
+                        enqueue_activity(**activity)
                     
                 except Exception as e:
+                    if sync:
+                        db.session.rollback()
                     logger.error(f"Failed to log user activity: {str(e)}")
                     # Don't fail the request if logging fails
             
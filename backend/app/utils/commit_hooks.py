@@ -0,0 +1,37 @@
+"""
+Deferred post-commit actions
+Mapper events fire at flush; work queued here runs only once the session commits
+(and is discarded on rollback), so caches are never cleared before the data changes
+"""
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session, object_session
+
+# session.info key -> handler(items) run after commit
+_handlers = {}
+
+
+def on_commit(key, handler):
+    """Register handler(items) to receive the items queued under key when a session commits"""
+    _handlers[key] = handler
+
+
+def defer_until_commit(target, key, item):
+    """Queue item under key on target's session (call from mapper events)"""
+    session = object_session(target)
+    if session is not None:
+        session.info.setdefault(key, set()).add(item)
+
+
+@event.listens_for(Session, 'after_commit')
+def _run_commit_handlers(session):
+    for key, handler in _handlers.items():
+        items = session.info.pop(key, None)
+        if items:
+            handler(items)
+
+
+@event.listens_for(Session, 'after_rollback')
+def _discard_pending(session):
+    for key in _handlers:
+        session.info.pop(key, None)
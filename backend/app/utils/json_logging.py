@@ -0,0 +1,55 @@
+"""
+Structured JSON log formatting
+One JSON object per record, serialized with orjson when it is installed
+"""
+
+import json
+import logging
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# Attributes every LogRecord has; anything else on a record came from extra= or a record factory
+_RESERVED_ATTRS = frozenset(vars(logging.LogRecord('', 0, '', 0, '', (), None))) | {'message', 'asctime'}
+
+
+def _dumps(entry):
+    if orjson is not None:
+        return orjson.dumps(entry, default=str).decode()
+    return json.dumps(entry, default=str)
+
+
+class JSONFormatter(logging.Formatter):
+    """Format records as JSON: timestamp, level, logger, message plus any extra fields"""
+
+    def format(self, record):
+        entry = {
+            'timestamp': self.formatTime(record),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage(),
+        }
+        for key, value in record.__dict__.items():
+            if key not in _RESERVED_ATTRS:
+                entry[key] = value
+        if record.exc_info:
+            entry['exc_info'] = self.formatException(record.exc_info)
+        return _dumps(entry)
+
+
+def enable_json_logging(level=logging.INFO):
+    """
+    Format all root-logger output as JSON.
+
+    Existing root handlers get the JSON formatter; if none are configured
+    a stderr StreamHandler is added.
+    """
+    root = logging.getLogger()
+    if not root.handlers:
+        root.addHandler(logging.StreamHandler())
+    formatter = JSONFormatter()
+    for handler in root.handlers:
+        handler.setFormatter(formatter)
+    root.setLevel(level)
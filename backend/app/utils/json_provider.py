@@ -0,0 +1,37 @@
+"""
+Fast JSON serialization for API responses
+Flask JSON provider backed by orjson (C extension), used when orjson is installed
+"""
+
+from flask.json.provider import DefaultJSONProvider
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+class OrjsonProvider(DefaultJSONProvider):
+    """
+    Drop-in replacement for Flask's DefaultJSONProvider.
+
+    Output matches the default provider: keys are sorted, non-string keys
+    (e.g. lesson-id dicts) are allowed, and date/datetime values still go
+    through DefaultJSONProvider.default so their format doesn't change.
+    """
+
+    _OPTIONS = (orjson.OPT_SORT_KEYS | orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME) if orjson else 0
+
+    def dumps(self, obj, **kwargs):
+        return orjson.dumps(obj, default=self.default, option=self._OPTIONS).decode()
+
+    def loads(self, s, **kwargs):
+        return orjson.loads(s)
+
+
+def init_json_provider(app):
+    """Install the orjson provider on app if orjson is available"""
+    if orjson is None:
+        app.logger.info("orjson not installed - using Flask's default JSON provider")
+        return
+    app.json = OrjsonProvider(app)
@@ -236,7 +236,185 @@ def startup():
                 if 'does not exist' not in str(e).lower():
                     print(f"Note: Schema migration check: {e}")
                 db.session.rollback()
-            
+
+            # Step 2c: Create indexes declared on models that existing tables are missing
+            # (create_all only creates indexes together with new tables; InnoDB builds these online)
+            try:
+                from sqlalchemy import inspect
+
+                inspector = inspect(db.engine)
+                table_names = set(inspector.get_table_names())
+                for table in db.metadata.sorted_tables:
+                    if table.name not in table_names:
+                        continue
+                    existing_indexes = {ix['name'] for ix in inspector.get_indexes(table.name)}
+                    for index in table.indexes:
+                        if index.name in existing_indexes:
+                            continue
+                        print(f"Creating missing index '{index.name}' on {table.name}...")
+                        try:
+                            index.create(db.engine)
+                            print(f"✓ Index '{index.name}' created successfully")
+                        except Exception as index_error:
+                            if 'Duplicate key name' in str(index_error):
+                                print(f"Index '{index.name}' already exists (added by another process)")
+                            else:
+                                print(f"Warning: Could not create index '{index.name}': {index_error}")
+            except Exception as e:
+                print(f"Note: Index migration check: {e}")
+
+            # Step 2d: Move legacy JSON completion lists on user_progress into
+            # user_lesson_progress / user_module_progress rows. A column is dropped
+            # only once every listed id is verified to have a completed row.
+            try:
+                import json
+                from datetime import datetime
+                from sqlalchemy import inspect, text
+                from app.models.content import Lesson, Module
+                from app.models.progress import UserLessonProgress, UserModuleProgress
+
+                inspector = inspect(db.engine)
+                if 'user_progress' in inspector.get_table_names():
+                    progress_columns = {col['name'] for col in inspector.get_columns('user_progress')}
+                    # Same completed-state values as progress._record_completed_lessons/_modules
+                    legacy_targets = [
+                        (column, model, fk_name, parent, completed_fields)
+                        for column, model, fk_name, parent, completed_fields in (
+                            ('completed_lessons', UserLessonProgress, 'lesson_id', Lesson,
+                             {'status': 'completed', 'is_completed': True}),
+                            ('completed_modules', UserModuleProgress, 'module_id', Module,
+                             {'progress_percentage': 100.0, 'is_completed': True}),
+                        )
+                        if column in progress_columns
+                    ]
+                    for column, model, fk_name, parent, completed_fields in legacy_targets:
+                        print(f"Backfilling {model.__tablename__} from user_progress.{column}...")
+                        valid_ids = {row_id for (row_id,) in db.session.query(parent.id)}
+                        legacy_pairs = set()
+                        for user_id, raw_ids in db.session.execute(
+                            text(f"SELECT user_id, {column} FROM user_progress WHERE {column} IS NOT NULL")
+                        ):
+                            item_ids = json.loads(raw_ids) if isinstance(raw_ids, str) else raw_ids
+                            for item_id in item_ids or ():
+                                try:
+                                    item_id = int(item_id)
+                                except (TypeError, ValueError):
+                                    continue
+                                if item_id in valid_ids:
+                                    legacy_pairs.add((user_id, item_id))
+
+                        fk_column = getattr(model, fk_name)
+                        completed_at = datetime.utcnow()
+                        existing_rows = {
+                            (row.user_id, getattr(row, fk_name)): row
+                            for row in model.query.filter(
+                                model.user_id.in_({user_id for user_id, _ in legacy_pairs})
+                            )
+                        } if legacy_pairs else {}
+                        updated_count = 0
+                        new_rows = []
+                        for user_id, item_id in legacy_pairs:
+                            row = existing_rows.get((user_id, item_id))
+                            if row is None:
+                                new_rows.append(model(
+                                    user_id=user_id, completed_at=completed_at,
+                                    **{fk_name: item_id}, **completed_fields
+                                ))
+                            elif not row.is_completed:
+                                for field, value in completed_fields.items():
+                                    setattr(row, field, value)
+                                row.completed_at = row.completed_at or completed_at
+                                updated_count += 1
+                        db.session.add_all(new_rows)
+                        db.session.commit()
+                        print(f"✓ Backfilled {len(new_rows)} new and {updated_count} existing {model.__tablename__} rows")
+
+                        # Verify before dropping: every legacy pair must now be a completed row
+                        completed_pairs = set(
+                            db.session.query(model.user_id, fk_column).filter(model.is_completed.is_(True))
+                        )
+                        missing_pairs = legacy_pairs - completed_pairs
+                        if missing_pairs:
+                            print(f"Warning: Keeping user_progress.{column}, {len(missing_pairs)} entries not backfilled")
+                            continue
+                        db.session.execute(text(f"ALTER TABLE user_progress DROP COLUMN {column}"))
+                        db.session.commit()
+                        print(f"✓ Verified backfill and dropped user_progress.{column}")
+            except Exception as e:
+                db.session.rollback()
+                print(f"Warning: Completion backfill failed (legacy columns kept): {e}")
+
+            # Step 2e: Give existing DATETIME columns the server-side defaults the models declare
+            # (created_at/timestamp -> CURRENT_TIMESTAMP, updated_at -> ... ON UPDATE CURRENT_TIMESTAMP)
+            try:
+                from sqlalchemy import text
+
+                current_columns = {
+                    (table_name, column_name): (column_default, extra.lower())
+                    for table_name, column_name, column_default, extra in db.session.execute(text(
+                        "SELECT TABLE_NAME, COLUMN_NAME, COLUMN_DEFAULT, EXTRA FROM information_schema.COLUMNS "
+                        "WHERE TABLE_SCHEMA = DATABASE() AND DATA_TYPE = 'datetime'"
+                    ))
+                }
+                for table in db.metadata.sorted_tables:
+                    for column in table.columns:
+                        if column.server_default is None or (table.name, column.name) not in current_columns:
+                            continue
+                        column_default, extra = current_columns[(table.name, column.name)]
+                        wants_on_update = column.server_onupdate is not None
+                        if column_default is not None and (not wants_on_update or 'on update' in extra):
+                            continue
+                        default_clause = "DEFAULT CURRENT_TIMESTAMP"
+                        if wants_on_update:
+                            default_clause += " ON UPDATE CURRENT_TIMESTAMP"
+                        print(f"Setting {default_clause} on {table.name}.{column.name}...")
+                        db.session.execute(text(
+                            f"ALTER TABLE {table.name} MODIFY {column.name} DATETIME "
+                            f"{'NULL' if column.nullable else 'NOT NULL'} {default_clause}"
+                        ))
+                db.session.commit()
+            except Exception as e:
+                db.session.rollback()
+                print(f"Note: DATETIME default migration check: {e}")
+
+            # Step 2f: Convert VARCHAR status/type columns the models declare as ENUM
+            # (only when every stored value is a valid member, otherwise the column is left as is)
+            try:
+                from sqlalchemy import text, Enum
+
+                current_types = {
+                    (table_name, column_name): data_type
+                    for table_name, column_name, data_type in db.session.execute(text(
+                        "SELECT TABLE_NAME, COLUMN_NAME, DATA_TYPE FROM information_schema.COLUMNS "
+                        "WHERE TABLE_SCHEMA = DATABASE()"
+                    ))
+                }
+                for table in db.metadata.sorted_tables:
+                    for column in table.columns:
+                        if not isinstance(column.type, Enum):
+                            continue
+                        if current_types.get((table.name, column.name)) != 'varchar':
+                            continue
+                        stored_values = {
+                            value for (value,) in db.session.execute(text(
+                                f"SELECT DISTINCT {column.name} FROM {table.name} WHERE {column.name} IS NOT NULL"
+                            ))
+                        }
+                        unknown_values = stored_values - set(column.type.enums)
+                        if unknown_values:
+                            print(f"Warning: Keeping {table.name}.{column.name} as VARCHAR, unexpected values: {sorted(unknown_values)}")
+                            continue
+                        enum_type = column.type.compile(dialect=db.engine.dialect)
+                        print(f"Converting {table.name}.{column.name} to {enum_type}...")
+                        db.session.execute(text(
+                            f"ALTER TABLE {table.name} MODIFY {column.name} {enum_type} "
+                            f"{'NULL' if column.nullable else 'NOT NULL'}"
+                        ))
+                db.session.commit()
+            except Exception as e:
+                db.session.rollback()
+                print(f"Note: ENUM column migration check: {e}")
+
             # Check if we have data
             from app.models.user import User
             try:
@@ -288,6 +466,10 @@ def startup():
         print("\n⏹Press Ctrl+C to stop the server")
         print("=" * 50)
         
+        # Keep the leaderboard snapshot table fresh, now that migrations have run
+        from app.services.leaderboard_service import start_leaderboard_refresh_worker
+        start_leaderboard_refresh_worker(app)
+        
         # Start the server using socketio (as configured in wsgi.py)
         socketio.run(app, host='0.0.0.0', port=8085, debug=True)
         
@@ -4,10 +4,14 @@ WSGI entry point for production deployment
 
 import os
 from app import create_app, socketio
+from app.services.leaderboard_service import start_leaderboard_refresh_worker
 
 # Create Flask application
 application = create_app()
 
+# Keep the leaderboard snapshot table fresh (read by /progress/leaderboard)
+start_leaderboard_refresh_worker(application)
+
 if __name__ == '__main__':
     # Run with SocketIO on port 8085
     # CRITICAL-001 Fix: Use environment variable for debug mode, default to False for production